@@ -1,9 +1,29 @@
 import argparse
+import cProfile
+import os
+from contextlib import contextmanager
 from math import ceil
-import src.training as training
-import src.plotting as plotting
-import src.scoring as scoring
 import utils.model as model
+import utils.rna_extractor as rna_extractor
+import utils.structure_cache as structure_cache
+import utils.instrumentation as instrumentation
+
+
+@contextmanager
+def pipeline_step(name, profile_dir):
+    """Time a pipeline step and, if `profile_dir` is set, dump its cProfile statistics there."""
+
+    profiler = cProfile.Profile() if profile_dir else None
+    with instrumentation.step(name):
+        if profiler:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+                os.makedirs(profile_dir, exist_ok=True)
+                profiler.dump_stats(os.path.join(profile_dir, f"{name}.prof"))
 
 
 def main():
@@ -19,7 +39,7 @@ def main():
 
     # ===== DIRECTORIES =====
     parser.add_argument("--trainset", default="data/structures/train",
-                        help="Directory containing training PDB/CIF files")
+                        help="Directory containing training PDB/CIF files, or text file listing them")
     parser.add_argument("--profiles", default="data/profiles",
                         help="Directory to save or load trained profiles")
     parser.add_argument("--testset", default="data/structures/test",
@@ -36,9 +56,59 @@ def main():
                         help="Maximum allowed score value in the statistical potential (default: 10)")
     parser.add_argument("--bin-width", type=float, default=None,
                         help="Histogram bin width for distance distributions (default: 1.0 Å)")
+    parser.add_argument("--kde-bandwidth", type=float, default=None,
+                        help="Smooth the distance distributions with a Gaussian KDE of this bandwidth in Å")
+    parser.add_argument("--neighbor-search", choices=model.neighbor_search_methods, default=None,
+                        help="Contact search backend: brute-force, cell-list grid or KD-tree (default: brute)")
+    parser.add_argument("--parser", choices=rna_extractor.parser_backends, default=None,
+                        help="Structure parser: streaming fast path, Biopython, or both compared (default: fast)")
+    parser.add_argument("--channels", nargs="+", default=None, metavar="ATOM",
+                        help="Train and score these atom channels from a single parse, e.g. \"C3'\" P \"C4'\" N1/N9, "
+                             "with their sum as the combined score (default: C3' only)")
+
+    parser.add_argument("--no-text", action="store_true",
+                        help="Only write the binary profiles.npz, not the per-pair .txt profiles")
+
+    parser.add_argument("--update", action="store_true",
+                        help="Update existing profiles: only parse new or changed training files")
+
+    # ===== PARALLELISM =====
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes used for training and scoring (default: 1)")
+    parser.add_argument("--unordered", action="store_true",
+                        help="With several workers, write scores as they complete instead of in input order")
+    parser.add_argument("--block-size", type=int, default=None,
+                        help="Maximum number of pair distances held in memory at once per structure")
+    parser.add_argument("--lookup-step", type=float, default=None,
+                        help="Fast scoring: dense lookup table with cells of this width in Angstrom (e.g. 0.01)")
+    parser.add_argument("--decompose", action="store_true",
+                        help="Also write per-residue and per-pair-type energies next to the scores CSV")
+    parser.add_argument("--models", action="store_true",
+                        help="Score every model of multi-model files, one row per model")
+
+    # ===== PARSED-STRUCTURE CACHE =====
+    parser.add_argument("--cache-dir", default=None,
+                        help="Folder of the parsed-structure cache (default: data/cache of the repository)")
+    parser.add_argument("--cache-size", type=int, default=None,
+                        help="Maximum size of the parsed-structure cache in MB (default: 1024)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Bypass the parsed-structure cache")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="Empty the parsed-structure cache before running")
+
+    # ===== INSTRUMENTATION =====
+    parser.add_argument("--timings", choices=("json", "csv"), default=None,
+                        help="Write per-file and per-stage timings next to the scores in this format")
+    parser.add_argument("--cprofile-dir", default=None, metavar="DIR",
+                        help="Dump cProfile statistics of each step (main process only) to DIR")
 
     args = parser.parse_args()
 
+    if args.decompose and args.models:
+        parser.error("--decompose cannot be combined with --models")
+    if args.channels and (args.decompose or args.models):
+        parser.error("--channels cannot be combined with --decompose or --models")
+
     # ===== APPLY MODEL PARAMETER OVERRIDES =====
     if args.max_distance is not None:
         model.max_distance = args.max_distance
@@ -54,6 +124,34 @@ def main():
         model.bin_width = args.bin_width
         model.num_bins = ceil(model.max_distance / model.bin_width)  
 
+    if args.kde_bandwidth is not None:
+        model.kde_bandwidth = args.kde_bandwidth
+
+    if args.block_size is not None:
+        model.block_size = args.block_size
+
+    if args.neighbor_search is not None:
+        model.neighbor_search = args.neighbor_search
+
+    if args.parser is not None:
+        rna_extractor.parser_backend = args.parser
+
+    # ===== APPLY CACHE SETTINGS =====
+    if args.cache_dir is not None:
+        structure_cache.cache_dir = args.cache_dir
+
+    if args.cache_size is not None:
+        structure_cache.max_size = args.cache_size * (1 << 20)
+
+    if args.no_cache:
+        structure_cache.enabled = False
+
+    if args.clear_cache:
+        structure_cache.clear()
+
+    if args.timings is not None:
+        instrumentation.enabled = True
+
     # ===== DETERMINE WHICH STEPS SHOULD RUN =====
     run_training = not args.no_train
     run_plotting = not args.no_plot
@@ -68,17 +166,45 @@ def main():
     print("Profile directory:       ", args.profiles)
     print("Test set directory:      ", args.testset)
     print("Scores output directory: ", args.scores)
+    print("Structure cache:         ", structure_cache.cache_dir if structure_cache.enabled else None)
     print("================================\n")
 
     # ===== RUN THE SELECTED STEPS =====
+    scores_file = None
+
+    # Steps are imported on demand: plotting pulls in matplotlib, training and scoring
+    # their own dependencies, which short scoring-only runs should not pay for
     if run_training:
-        training.run_train(args.trainset, args.profiles)
+        import src.training as training
+        with pipeline_step("train", args.cprofile_dir):
+            training.run_train(args.trainset, args.profiles, args.workers, not args.no_text, args.update,
+                               args.channels)
 
     if run_plotting:
-        plotting.make_plot()
+        import src.plotting as plotting
+        with pipeline_step("plot", args.cprofile_dir):
+            plotting.make_plot()
 
     if run_scoring:
-        scoring.run_score(args.profiles, args.testset, args.scores)
+        import src.scoring as scoring
+        with pipeline_step("score", args.cprofile_dir):
+            if args.channels:
+                scores_file = scoring.run_score_channels(args.profiles, args.testset, args.scores,
+                                                         args.channels, args.workers, not args.unordered,
+                                                         args.lookup_step)
+            else:
+                scores_file = scoring.run_score(args.profiles, args.testset, args.scores, args.workers,
+                                                not args.unordered, args.lookup_step, args.decompose,
+                                                args.models)
+
+    # ===== WRITE THE TIMING REPORT =====
+    if args.timings is not None:
+        if scores_file is not None:
+            report = f"{os.path.splitext(scores_file)[0]}_timings.{args.timings}"
+        else:
+            report = os.path.join(args.scores, f"timings.{args.timings}")
+        instrumentation.write_report(report)
+        print(f"Timings saved to {report}")
 
 
 if __name__ == "__main__":
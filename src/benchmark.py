@@ -0,0 +1,335 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import shutil
+import subprocess
+import tempfile
+import tracemalloc
+import numpy as np
+
+import utils.rna_extractor as rna_extractor
+import utils.model as model
+import utils.structure_cache as structure_cache
+import src.training as training
+import src.scoring as scoring
+
+def synthetic_structure(n, num_chains=1, seed=0):
+    """
+    Generate a synthetic RNA of `n` nucleotides as a compact random walk of C3' atoms.
+
+    Consecutive atoms are 5.9 Å apart (the typical C3'-C3' step) and the walk is confined to
+    a sphere of radius 7 n^(1/3) Å, the size of a folded RNA of that length.
+
+    Parameters
+    ----------
+    n : int
+        Number of nucleotides.
+    num_chains : int
+        Number of chains the nucleotides are split into.
+    seed : int
+        Seed of the random generator.
+
+    Returns
+    -------
+    tuple
+        `(chains, residues, coords)` arrays as produced by `model.encode_atoms`.
+    """
+
+    rng = np.random.default_rng(seed)
+    radius = 7.0 * n ** (1 / 3)
+    coords = np.empty((n, 3))
+    position = np.zeros(3)
+
+    for k in range(n):
+        for _ in range(20):
+            step = rng.normal(size=3)
+            candidate = position + 5.9 * step / np.linalg.norm(step)
+            if candidate @ candidate < radius * radius:
+                break
+        position = candidate
+        coords[k] = position
+
+    chains = np.repeat(np.arange(num_chains), -(-n // num_chains))[:n]
+    residues = rng.integers(0, len(model.nucleotides), size=n)
+    return chains, residues, coords
+
+def measure(func, repeat=1):
+    """
+    Time a call and record its peak traced memory.
+
+    Timings are taken without memory tracing, which would slow the call down; the peak
+    memory comes from one additional traced call.
+
+    Parameters
+    ----------
+    func : callable
+        Function called without arguments.
+    repeat : int
+        Number of timed calls; the fastest is reported.
+
+    Returns
+    -------
+    tuple
+        `(result, seconds, peak_mb)`.
+    """
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return result, best, peak / 2 ** 20
+
+def _record(results, stage, size, method, seconds, peak_mb, contacts=None):
+    entry = {"stage": stage, "size": size, "method": method,
+             "seconds": seconds, "peak_mb": round(peak_mb, 3)}
+    if contacts is not None:
+        entry["contacts"] = int(contacts)
+        entry["contacts_per_s"] = contacts / seconds if seconds > 0 else None
+    results.append(entry)
+    rate = f"  {entry['contacts_per_s']:,.0f} contacts/s" if contacts else ""
+    print(f" - {stage:<10} {method:<10} n={size:<7} {seconds:9.4f} s  {peak_mb:9.2f} MB{rate}")
+
+def run_benchmark(structure_dir, sizes, methods, brute_limit, repeat=1):
+    """
+    Benchmark extraction, contact search, histogramming, training and scoring.
+
+    Parameters
+    ----------
+    structure_dir : str
+        Folder of PDB/CIF structures (real inputs for the extraction and training stages).
+    sizes : list of int
+        Numbers of nucleotides of the synthetic structures.
+    methods : list of str
+        Neighbor search backends to benchmark.
+    brute_limit : int
+        Largest synthetic size benchmarked with the brute-force backend.
+    repeat : int
+        Number of timed calls per measurement; the fastest is reported.
+
+    Returns
+    -------
+    list of dict
+        One entry per measurement: stage, size, method, seconds, peak_mb and, for stages
+        that produce contacts, contacts and contacts_per_s.
+    """
+
+    results = []
+    saved_parameters = model.parameters()
+    saved_cache = structure_cache.enabled
+    structure_cache.enabled = False
+
+    try:
+        # === Real structures: parsing and end-to-end training ===
+        struct_files = sorted(
+            os.path.join(structure_dir, f)
+            for f in os.listdir(structure_dir)
+            if f.lower().endswith((".pdb", ".cif", ".mmcif"))
+        )
+        total_atoms = 0
+        for label, extract in (("biopython", rna_extractor.extract_c3_atoms),
+                               ("fast", rna_extractor.read_c3_arrays)):
+            atoms, seconds, peak = measure(lambda: [extract(f) for f in struct_files], repeat)
+            total_atoms = sum(len(a[0]) if label == "fast" else len(a) for a in atoms)
+            _record(results, "extract", total_atoms, label, seconds, peak)
+
+        for method in methods:
+            model.configure(neighbor_search=method)
+            _, seconds, peak = measure(lambda: training.train(struct_files), repeat)
+            _record(results, "train", total_atoms, method, seconds, peak)
+
+        # === Synthetic structures of increasing size ===
+        centers = (np.arange(model.num_bins) + 0.5) * model.bin_width
+        table = np.random.default_rng(0).uniform(-2, model.maximum_score, (len(model.base_pairs), model.num_bins))
+        for size in sizes:
+            chains, residues, coords = synthetic_structure(size)
+
+            contacts = None
+            for method in methods:
+                if method == "brute" and size > brute_limit:
+                    continue
+                model.configure(neighbor_search=method)
+                contacts, seconds, peak = measure(
+                    lambda: model.residue_contacts(chains, residues, coords), repeat)
+                _record(results, "contacts", size, method, seconds, peak, len(contacts[2]))
+
+            # The later stages need contacts of this size
+            if contacts is None:
+                print(f" - n={size}: no contact search backend ran, skipping the counts and score stages")
+                continue
+            _, _, distances, codes = contacts
+
+            _, seconds, peak = measure(lambda: model.contact_counts(distances, codes), repeat)
+            _record(results, "counts", size, "bincount", seconds, peak, len(distances))
+
+            _, seconds, peak = measure(lambda: scoring.score_contacts(codes, distances, centers, table), repeat)
+            _record(results, "score", size, "kernel", seconds, peak, len(distances))
+    finally:
+        model.configure(**saved_parameters)
+        structure_cache.enabled = saved_cache
+
+    return results
+
+def _run_command(command, cwd):
+    """Run a command to completion and return its wall time."""
+
+    start = time.perf_counter()
+    subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+def run_startup_benchmark(struct_file, repeat=5):
+    """
+    Measure the wall time of scoring one structure from a fresh interpreter with every entry
+    point, as a cluster job scoring a single decoy would.
+
+    The bare interpreter and a plain NumPy import are measured as lower bounds.
+
+    Parameters
+    ----------
+    struct_file : str
+        PDB/CIF structure scored by every entry point.
+    repeat : int
+        Number of runs per entry point; the fastest is reported.
+
+    Returns
+    -------
+    list of dict
+        One entry per entry point, in the format of `run_benchmark` (stage "startup");
+        memory is not measured and reported as 0.
+    """
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    struct_file = os.path.abspath(struct_file)
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        testset = os.path.join(tmp, "test")
+        os.makedirs(testset)
+        shutil.copy(struct_file, testset)
+        scores = os.path.join(tmp, "scores")
+
+        commands = {
+            "python": [sys.executable, "-c", "pass"],
+            "numpy": [sys.executable, "-c", "import numpy"],
+            "quick_score": [sys.executable, "-m", "src.quick_score", struct_file],
+            "scoring": [sys.executable, "-m", "src.scoring", "--testset", testset,
+                        "--output", scores, "--no-cache"],
+            "main": [sys.executable, "main.py", "--no-train", "--no-plot", "--testset", testset,
+                     "--scores", scores, "--no-cache"],
+        }
+
+        for label, command in commands.items():
+            seconds = min(_run_command(command, root) for _ in range(repeat))
+            _record(results, "startup", 1, label, seconds, 0.0)
+
+    return results
+
+def compare(results, baseline, tolerance, min_seconds=0.01):
+    """
+    Compare benchmark results against a saved baseline.
+
+    Parameters
+    ----------
+    results : list of dict
+        Current measurements, as returned by `run_benchmark`.
+    baseline : list of dict
+        Baseline measurements.
+    tolerance : float
+        Allowed relative slowdown (0.2 = 20 % slower) before a measurement counts as a regression.
+    min_seconds : float
+        Measurements faster than this in both runs are too noisy to compare and are skipped.
+
+    Returns
+    -------
+    list of str
+        Description of every regression; empty if none.
+    """
+
+    reference = {(r["stage"], r["size"], r["method"]): r for r in baseline}
+    regressions = []
+
+    for r in results:
+        base = reference.get((r["stage"], r["size"], r["method"]))
+        if base is None or max(base["seconds"], r["seconds"]) < min_seconds:
+            continue
+        ratio = r["seconds"] / base["seconds"]
+        if ratio > 1 + tolerance:
+            regressions.append(f"{r['stage']} {r['method']} n={r['size']}: "
+                               f"{base['seconds']:.4f} s -> {r['seconds']:.4f} s ({ratio:.2f}x)")
+
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the RNA scoring pipeline stages")
+
+    parser.add_argument("--structures", default="data/structures/train",
+                        help="Folder of PDB/CIF structures used for the extraction and training stages "
+                             "(default: data/structures/train)")
+
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000, 20000, 50000],
+                        help="Numbers of nucleotides of the synthetic structures (default: 100 1000 5000 20000 50000)")
+
+    parser.add_argument("--methods", nargs="+", choices=model.neighbor_search_methods,
+                        default=list(model.neighbor_search_methods),
+                        help="Neighbor search backends to benchmark (default: all)")
+
+    parser.add_argument("--brute-limit", type=int, default=20000,
+                        help="Largest synthetic size benchmarked with the brute-force backend (default: 20000)")
+
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Timed calls per measurement, the fastest is reported (default: 1)")
+
+    parser.add_argument("--startup", action="store_true",
+                        help="Only benchmark the start-up time of the scoring entry points on one structure")
+
+    parser.add_argument("--startup-structure", default="data/structures/test/4GXY.pdb",
+                        help="Structure scored by the start-up benchmark (default: data/structures/test/4GXY.pdb)")
+
+    parser.add_argument("--save", default=None,
+                        help="Write the results to this JSON file")
+
+    parser.add_argument("--baseline", default=None,
+                        help="Compare against the results saved in this JSON file")
+
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative slowdown versus the baseline (default: 0.25)")
+
+    args = parser.parse_args()
+
+    if args.startup:
+        results = run_startup_benchmark(args.startup_structure, max(args.repeat, 5))
+    else:
+        results = run_benchmark(args.structures, args.sizes, args.methods, args.brute_limit, args.repeat)
+
+    if args.save:
+        report = {
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "results": results,
+        }
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=1)
+        print(f"Benchmark results saved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions against", args.baseline)
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline}")
@@ -1,7 +1,7 @@
 import os
-import numpy as np
 import matplotlib.pyplot as plt
 from utils.pair import set_pairs
+import utils.profiles as profiles
 
 nucleotides = ["A", "U", "G", "C"]
 base_pairs = set_pairs(nucleotides)
@@ -26,15 +26,10 @@ def make_plot():
 
     os.makedirs(plot_dir, exist_ok=True)
 
-    for pair in base_pairs:
-        filename = os.path.join(profile_dir, f"{pair}.txt")
-        if not os.path.exists(filename):
-            continue
+    # Load distributions (rows ordered as base_pairs)
+    distance, table, _ = profiles.load_profiles(profile_dir)
 
-        # Load distribution
-        data = np.loadtxt(filename)
-        distance = data[:, 0]
-        score = data[:, 1]
+    for pair, score in zip(base_pairs, table):
 
         plt.figure(figsize=(6, 4))
         plt.plot(distance, score)
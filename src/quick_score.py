@@ -0,0 +1,33 @@
+# Lean scoring entry point for many short jobs (e.g. one decoy per cluster task): only NumPy,
+# the streaming parser, the profile loader and `utils.energy` (the scoring of `src.scoring`)
+# are imported, Biopython only if a file needs the fallback parser.
+# Usage: python -m src.quick_score decoy.pdb [...] --model data/profiles
+import os
+import argparse
+
+import utils.structure_cache as structure_cache
+import utils.profiles as profiles
+import utils.energy as energy
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score PDB/CIF structures with minimal start-up time, "
+                                                 "printing one struct_file,score line per structure "
+                                                 "(the parsed-structure cache is not used)")
+    parser.add_argument("structures", nargs="+", help="PDB/CIF files to score")
+    parser.add_argument("--model", default="data/profiles",
+                        help="Folder containing trained model profiles (default: data/profiles)")
+    parser.add_argument("--lookup-step", type=float, default=None,
+                        help="Fast scoring: dense lookup table with cells of this width in Angstrom")
+    args = parser.parse_args(argv)
+
+    structure_cache.enabled = False
+
+    centers, table, _ = profiles.load_profiles(args.model, configure=True)
+    lookup = energy.load_lookup(centers, table, args.lookup_step)
+
+    for struct_file in args.structures:
+        print(f"{os.path.basename(struct_file)},{energy.score_file(struct_file, centers, table, lookup=lookup)}")
+
+
+if __name__ == "__main__":
+    main()
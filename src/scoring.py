@@ -1,14 +1,30 @@
 import math
+import io
 import os
 import argparse
 import datetime
 import csv
+import contextlib
+import multiprocessing
+from functools import partial
+from itertools import islice
 import numpy as np
 
-import utils.pair as pair
 import utils.rna_extractor as rna_extractor
 import utils.model as model
-import utils.interpolation as interpolation
+import utils.structure_cache as structure_cache
+import utils.profiles as profiles
+import utils.instrumentation as instrumentation
+import utils.decoys as decoys
+import utils.trajectory as trajectory
+from utils.energy import contact_scores, score_contacts, decompose_contacts, load_lookup, score_file
+
+def report_lookup(lookup):
+    """Print the size and error bound of a `load_lookup` table; nothing if it is None."""
+
+    if lookup is not None:
+        scale, lut, max_error = lookup
+        print(f"Lookup table: {lut.shape[1]} cells of {1 / scale:g} A, max error per contact {max_error:.3g}")
 
 def score(atoms, reference_distributions):
     """
@@ -26,69 +42,482 @@ def score(atoms, reference_distributions):
     float
         Estimated Gibbs free energy of the RNA conformation.
     """
-    distances = model.residue_distances(atoms)
-    s = 0.0
+    centers, table = profiles.stack_profiles(reference_distributions)
+    _, _, distances, codes = model.residue_contacts(*model.encode_atoms(atoms))
+    return score_contacts(codes, distances, centers, table)
+
+def candidate_contacts(chains, residues):
+    """
+    Candidate pairs of a topology (see `model.candidate_pairs`) with their pair codes.
+
+    Returns
+    -------
+    tuple
+        `(i, j, codes)` arrays.
+    """
+
+    i, j = model.candidate_pairs(chains)
+    return i, j, model.pair_codes[residues[i], residues[j]]
+
+def score_frames(chains, residues, frames, centers, table, lookup=None, pairs=None):
+    """
+    Score every frame of an ensemble sharing one topology with a batched kernel.
+
+    The candidate pairs and their pair codes are computed once; the distances of all
+    candidates are then evaluated for blocks of frames of at most `model.block_size`
+    distances and all contacts of a block are scored in one pass. Very large structures,
+    whose candidate list would not fit a few blocks, are scored frame by frame with
+    `model.residue_contacts` instead.
+
+    Parameters
+    ----------
+    chains : np.ndarray
+        Integer chain code of every residue.
+    residues : np.ndarray
+        Integer residue code of every residue.
+    frames : np.ndarray
+        `(num_frames, num_residues, 3)` coordinates.
+    centers : np.ndarray
+        Bin centers shared by all profiles.
+    table : np.ndarray
+        Stacked profile scores, as returned by `profiles.stack_profiles`.
+    lookup : tuple, optional
+        Dense lookup table from `load_lookup` (fast scoring mode).
+    pairs : tuple, optional
+        `(i, j, codes)` candidate pairs of this topology and their pair codes, as computed
+        by `candidate_contacts`, when the caller keeps them across calls.
 
-    norm_pair = pair.normalize_pair
-    lin_interp = interpolation.linear_interpolation
+    Returns
+    -------
+    np.ndarray
+        Score of every frame.
+    """
 
-    for residue_i, residue_j, d in distances:
-        key = norm_pair(residue_i, residue_j)
-        rd = reference_distributions[key]
+    frames = np.asarray(frames, dtype=float)
+    n = len(chains)
 
-        centers = rd[:, 0]
-        scores  = rd[:, 1]
+    if pairs is None and n * (n - 1) // 2 > 4 * model.block_size:
+        scores = []
+        for coords in frames:
+            _, _, distances, codes = model.residue_contacts(chains, residues, coords)
+            scores.append(score_contacts(codes, distances, centers, table, lookup))
+        return np.array(scores)
 
-        # Find where d fits in bin centers
-        idx = np.searchsorted(centers, d)
+    i, j, codes = pairs if pairs is not None else candidate_contacts(chains, residues)
+    scores = np.zeros(len(frames))
+    frames_per_block = max(1, model.block_size // max(len(i), 1))
 
-        # Clamp to edges
-        if idx == 0:
-            s += scores[0]
-            continue
-        if idx >= len(centers):
-            s += scores[-1]
-            continue
+    # One (num_residues, num_frames) array per axis: gathering pairs then copies whole rows
+    axes = [np.ascontiguousarray(frames[:, :, k].T) for k in range(3)]
 
-        x0 = centers[idx - 1]
-        y0 = scores[idx - 1]
-        x1 = centers[idx]
-        y1 = scores[idx]
+    for start in range(0, len(frames), frames_per_block):
+        stop = min(start + frames_per_block, len(frames))
+        d2 = np.zeros((len(i), stop - start))
+        for axis in axes:
+            block = axis[:, start:stop]
+            diff = block[j] - block[i]
+            d2 += diff * diff
 
-        s += lin_interp(x0, y0, x1, y1, d)
+        p, f = np.nonzero(d2 < model.max_distance_sq)
+        energies = contact_scores(codes[p], np.sqrt(d2[p, f]), centers, table, lookup)
+        scores[start:stop] = np.bincount(f, energies, stop - start)
 
-    return s
+    return scores
 
-def run_score(model_dir, testset_dir, output_dir):
+def score_models(struct_file, centers, table, lookup=None):
     """
-    Score a set of RNA structures against reference profiles and save the results.
+    Score every model of a multi-model PDB/CIF file (NMR ensemble, exported trajectory).
+
+    Parameters
+    ----------
+    struct_file : str
+        Path to the PDB/CIF structure.
+    centers : np.ndarray
+        Bin centers shared by all profiles.
+    table : np.ndarray
+        Stacked profile scores, as returned by `profiles.stack_profiles`.
+    lookup : tuple, optional
+        Dense lookup table from `load_lookup` (fast scoring mode).
+
+    Returns
+    -------
+    np.ndarray
+        Score of every model, in file order.
+    """
+
+    instrumentation.start_file("score", struct_file)
+
+    with instrumentation.stage("parse"):
+        chains, residues, frames = rna_extractor.extract_c3_models(struct_file)
+    with instrumentation.stage("interpolate"):
+        scores = score_frames(chains, residues, frames, centers, table, lookup)
+
+    instrumentation.count(atoms=len(chains), models=len(frames))
+    return scores
+
+def score_trajectory(topology_file, trajectory_file, centers, table, lookup=None, chunk_frames=1000):
+    """
+    Score every frame of a trajectory sharing the topology of a PDB/CIF file.
+
+    The topology is parsed once to get the residue codes and the positions of the C3' atoms
+    among all atoms; frames are then read from the memory-mapped trajectory in chunks and
+    scored with `score_frames`, so the trajectory never needs to fit in memory.
+
+    Parameters
+    ----------
+    topology_file : str
+        PDB/CIF file whose first model has the atoms of the trajectory, in the same order.
+    trajectory_file : str
+        `.npy` or `.dcd` coordinates (see `trajectory.open_frames`), either of all atoms of
+        the topology or of its C3' atoms only.
+    centers : np.ndarray
+        Bin centers shared by all profiles.
+    table : np.ndarray
+        Stacked profile scores, as returned by `profiles.stack_profiles`.
+    lookup : tuple, optional
+        Dense lookup table from `load_lookup` (fast scoring mode).
+    chunk_frames : int
+        Number of frames read and scored at once.
+
+    Yields
+    ------
+    tuple
+        `(start, scores)` for every chunk, `start` being the index of its first frame.
+    """
+
+    chains, residues, _, atom_indices = rna_extractor.read_c3_topology(topology_file)
+
+    _, num_atoms, _ = trajectory.open_frames(trajectory_file)
+    if num_atoms == len(atom_indices):
+        # Trajectory already reduced to the C3' atoms
+        atom_indices = np.arange(num_atoms)
+
+    for start, frames in trajectory.iter_frames(trajectory_file, atom_indices, chunk_frames):
+        yield start, score_frames(chains, residues, frames, centers, table, lookup)
+
+def run_score_trajectory(model_dir, topology_file, trajectory_file, output_file, chunk_frames=1000,
+                         lookup_step=None):
+    """
+    Score a trajectory frame by frame and stream the scores to a CSV with one `frame, score` row per frame.
 
     Parameters
     ----------
     model_dir : str
-        Path to the folder containing reference profile `.txt` files for base pairs.
-    testset_dir : str
-        Path to the folder containing PDB/CIF files of test RNA structures.
-    output_dir : str
-        Path to the folder where scoring results CSV will be saved.
-    
+        Path to the folder containing the reference profiles.
+    topology_file : str
+        PDB/CIF file with the atoms of the trajectory (see `score_trajectory`).
+    trajectory_file : str
+        `.npy` or `.dcd` coordinates.
+    output_file : str
+        Path to the scores CSV.
+    chunk_frames : int
+        Number of frames read and scored at once.
+    lookup_step : float, optional
+        Cell width of the dense lookup table of the fast scoring mode (see `load_lookup`).
+
     Returns
     -------
-    None
+    int
+        Number of frames scored.
     """
 
-    # === Load reference profiles ===
-    if not os.path.isdir(model_dir):
-        raise FileNotFoundError(f"Model folder {model_dir} not found")
+    centers, table, _ = profiles.load_profiles(model_dir, configure=True)
+    lookup = load_lookup(centers, table, lookup_step)
+    report_lookup(lookup)
 
-    reference_distributions = {}
-    for bp in model.base_pairs:
-        filename = os.path.join(model_dir, f"{bp}.txt")
-        data = np.loadtxt(filename)
-        reference_distributions[bp] = data
-        # reference_distributions[bp] = np.loadtxt(filename).tolist()
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    scored = 0
+
+    with open(output_file, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["frame", "score"])
+        for start, scores in score_trajectory(topology_file, trajectory_file, centers, table,
+                                              lookup, chunk_frames):
+            writer.writerows(enumerate(scores.tolist(), start=start))
+            scored += len(scores)
+            print(f" - frames {start}-{start + len(scores) - 1}: mean {scores.mean():.4f}")
+
+    print(f"Scored {scored} frames, scores saved to {output_file}")
+    return scored
+
+class IncrementalScorer:
+    """
+    Score of one structure kept up to date while residues are moved, e.g. in a sampling or
+    refinement loop.
+
+    The scorer holds the current coordinates, the total score and the per-residue energies
+    (each contact giving half of its score to each partner, as in `decompose_contacts`).
+    `move` only evaluates the contacts of the moved residues, before and after the move, so
+    its cost grows with `len(residue_indices) * num_residues` instead of `num_residues ** 2`.
+    Rounding errors accumulate over many moves; `rescore` recomputes everything from scratch.
+
+    Parameters
+    ----------
+    chains : np.ndarray
+        Integer chain code of every residue.
+    residues : np.ndarray
+        Integer residue code of every residue.
+    coords : np.ndarray
+        `(num_residues, 3)` initial coordinates; copied.
+    centers : np.ndarray
+        Bin centers shared by all profiles.
+    table : np.ndarray
+        Stacked profile scores, as returned by `profiles.stack_profiles`.
+    lookup : tuple, optional
+        Dense lookup table from `load_lookup` (fast scoring mode).
+    """
+
+    def __init__(self, chains, residues, coords, centers, table, lookup=None):
+        self.chains = np.asarray(chains)
+        self.residues = np.asarray(residues)
+        self.coords = np.array(coords, dtype=float)
+        self.centers = centers
+        self.table = table
+        self.lookup = lookup
+        self.rescore()
+
+    @classmethod
+    def from_file(cls, struct_file, centers, table, lookup=None):
+        """Build a scorer from the C3' atoms of a PDB/CIF file."""
+
+        return cls(*rna_extractor.extract_c3_arrays(struct_file), centers, table, lookup)
+
+    def rescore(self):
+        """
+        Recompute the total score and the per-residue energies from the current coordinates.
+
+        Returns
+        -------
+        float
+            Total score.
+        """
+
+        i, j, distances, codes = model.residue_contacts(self.chains, self.residues, self.coords)
+        energies = contact_scores(codes, distances, self.centers, self.table, self.lookup)
+        self.per_residue, _ = decompose_contacts(i, j, codes, energies, len(self.residues))
+        self.total = float(energies.sum()) if len(energies) else 0.0
+        return self.total
+
+    def _row_energies(self, rows):
+        """`(len(rows), num_residues)` contact energies of residues `rows`, 0 where there is no contact."""
+
+        diff = self.coords[None, :, :] - self.coords[rows][:, None, :]
+        d2 = np.sum(diff * diff, axis=2)
+
+        cols = np.arange(len(self.coords))
+        mask = np.abs(cols[None, :] - rows[:, None]) >= model.position_skip
+        mask &= self.chains[None, :] == self.chains[rows][:, None]
+        mask &= d2 < model.max_distance_sq
+
+        r, c = np.nonzero(mask)
+        codes = model.pair_codes[self.residues[rows[r]], self.residues[c]]
+        energies = np.zeros(d2.shape)
+        energies[r, c] = contact_scores(codes, np.sqrt(d2[r, c]), self.centers, self.table, self.lookup)
+        return energies
+
+    def move(self, residue_indices, new_coords):
+        """
+        Move some residues and update the score.
+
+        Parameters
+        ----------
+        residue_indices : array-like
+            Distinct indices of the moved residues.
+        new_coords : np.ndarray
+            `(len(residue_indices), 3)` new coordinates of these residues.
+
+        Returns
+        -------
+        float
+            Updated total score.
+        """
+
+        rows = np.asarray(residue_indices, dtype=np.intp).reshape(-1)
+        new_coords = np.asarray(new_coords, dtype=float).reshape(len(rows), 3)
+        if len(np.unique(rows)) != len(rows):
+            raise ValueError("Moved residue indices must be distinct")
+        if len(rows) == 0:
+            return self.total
+
+        before = self._row_energies(rows)
+        self.coords[rows] = new_coords
+        delta = self._row_energies(rows) - before
+
+        # A contact between two moved residues appears in two rows: count each half
+        delta[:, rows] *= 0.5
+
+        self.per_residue += 0.5 * delta.sum(axis=0)
+        self.per_residue[rows] += 0.5 * delta.sum(axis=1)
+        self.total += float(delta.sum())
+        return self.total
+
+class Scorer:
+    """
+    In-memory scorer of structures given as coordinate arrays, e.g. by a structure generator.
+
+    The profiles are loaded once. The candidate pairs of the last sequence seen and their
+    pair codes are kept, so that scoring many decoys of one sequence, one by one or as a
+    stacked batch, only computes distances and interpolates. Sequences too long for their
+    candidate list to fit a few blocks of `model.block_size` distances are scored with the
+    neighbor search of `model.residue_contacts` instead.
+
+    Parameters
+    ----------
+    model_dir : str
+        Path to the folder containing the reference profiles.
+    lookup_step : float, optional
+        Cell width of the dense lookup table of the fast scoring mode (see `load_lookup`).
+    """
+
+    def __init__(self, model_dir="data/profiles", lookup_step=None):
+        self.centers, self.table, _ = profiles.load_profiles(model_dir, configure=True)
+        self.lookup = load_lookup(self.centers, self.table, lookup_step)
+        self._topology = None
+        self._pairs = None
+
+    def topology(self, residues, chains=None):
+        """
+        Convert a sequence into the `(chains, residues)` integer arrays used for scoring.
+
+        Parameters
+        ----------
+        residues : str or array-like
+            Nucleotide string ("GGACU..."), residue names or integer residue codes.
+        chains : array-like, optional
+            Chain identifier of every residue (numbered by first appearance); one chain if None.
+
+        Returns
+        -------
+        tuple
+            `(chains, residues)` arrays.
+        """
+
+        residues = np.asarray(list(residues) if isinstance(residues, str) else residues)
+        if residues.dtype.kind in "US":
+            residues = model.encode_residues(residues.tolist())
+        residues = residues.astype(np.intp, copy=False)
+
+        if chains is None:
+            return np.zeros(len(residues), dtype=np.intp), residues
+        ids = {}
+        chains = np.fromiter((ids.setdefault(c, len(ids)) for c in chains), dtype=np.intp)
+        if len(chains) != len(residues):
+            raise ValueError(f"Got {len(chains)} chain identifiers for {len(residues)} residues")
+        return chains, residues
+
+    def _candidates(self, chains, residues):
+        """Candidate pairs of this topology, reused while the same sequence is scored."""
+
+        n = len(residues)
+        if n * (n - 1) // 2 > 4 * model.block_size:
+            return None
+        key = (chains.tobytes(), residues.tobytes(), model.position_skip)
+        if key != self._topology:
+            self._pairs = candidate_contacts(chains, residues)
+            self._topology = key
+        return self._pairs
+
+    def score_batch(self, frames, residues, chains=None):
+        """
+        Score a stack of decoys sharing one sequence in one vectorized call.
+
+        Parameters
+        ----------
+        frames : np.ndarray
+            `(num_decoys, num_residues, 3)` C3' coordinates.
+        residues : str or array-like
+            Sequence, see `topology`.
+        chains : array-like, optional
+            Chain identifier of every residue, see `topology`.
+
+        Returns
+        -------
+        np.ndarray
+            Score of every decoy.
+        """
+
+        chains, residues = self.topology(residues, chains)
+        frames = np.asarray(frames, dtype=float)
+        if frames.ndim != 3 or frames.shape[1:] != (len(residues), 3):
+            raise ValueError(f"Expected ({len(residues)}, 3) coordinates per decoy, got shape {frames.shape}")
+        return score_frames(chains, residues, frames, self.centers, self.table, self.lookup,
+                            self._candidates(chains, residues))
+
+    def score(self, coords, residues, chains=None):
+        """
+        Score one structure.
+
+        Parameters
+        ----------
+        coords : np.ndarray
+            `(num_residues, 3)` C3' coordinates.
+        residues : str or array-like
+            Sequence, see `topology`.
+        chains : array-like, optional
+            Chain identifier of every residue, see `topology`.
+
+        Returns
+        -------
+        float
+            Estimated Gibbs free energy of the RNA conformation.
+        """
+
+        coords = np.asarray(coords, dtype=float)
+        return float(self.score_batch(coords[None], residues, chains)[0])
+
+def decomposition_writers(output_file, stack):
+    """
+    Open the decomposition CSVs written next to a scores CSV.
+
+    `<stem>_residues.csv` has one row per residue (`struct_file`, `index` in structure order,
+    `chain` identifier, residue `number` and insertion code `icode` as in the file, `nucleotide`,
+    `energy`) and `<stem>_pairs.csv` one row per structure with the total energy of every pair type.
+
+    Parameters
+    ----------
+    output_file : str
+        Path to the scores CSV.
+    stack : contextlib.ExitStack
+        Stack the files are entered into, closing them when it exits.
+
+    Returns
+    -------
+    callable
+        `write(name, result)` appending the decomposition returned by `score_file`.
+    """
+
+    stem = os.path.splitext(output_file)[0]
+    residue_writer = csv.writer(stack.enter_context(open(f"{stem}_residues.csv", "w", newline="")))
+    pair_writer = csv.writer(stack.enter_context(open(f"{stem}_pairs.csv", "w", newline="")))
+    residue_writer.writerow(["struct_file", "index", "chain", "number", "icode", "nucleotide", "energy"])
+    pair_writer.writerow(["struct_file", *model.base_pairs])
+
+    def write(name, result):
+        _, _, residues, labels, per_residue, per_pair = result
+        residue_writer.writerows(
+            (name, k, chain, number, icode, model.nucleotides[r], e)
+            for k, ((chain, number, icode), r, e) in enumerate(zip(labels.tolist(), residues.tolist(),
+                                                                    per_residue.tolist()))
+        )
+        pair_writer.writerow((name, *per_pair.tolist()))
+
+    return write
+
+def list_structures(testset_dir):
+    """
+    List the PDB/CIF files of a test set folder.
+
+    Parameters
+    ----------
+    testset_dir : str
+        Path to the folder containing PDB/CIF files of test RNA structures.
+
+    Returns
+    -------
+    list
+        Paths of the structure files.
+    """
 
-    # === Load test PDBs/CIFs ===
     if not os.path.isdir(testset_dir):
         raise FileNotFoundError(f"Test dataset folder {testset_dir} not found")
 
@@ -101,27 +530,377 @@ def run_score(model_dir, testset_dir, output_dir):
     if not test_files:
         raise RuntimeError(f"No PDB/CIF files found in {testset_dir}")
 
-    # === Score all test structures ===
-    results = []
-    for struct_file in test_files:
-        atoms = rna_extractor.extract_c3_atoms(struct_file)
-        s = score(atoms, reference_distributions)
-        print(f" - {os.path.basename(struct_file)}: {s:.4f}")
-        results.append((os.path.basename(struct_file), s))
+    return test_files
+
+def timestamped_file(output_dir, kind="scores"):
+    """Path of a new `<output_dir>/<timestamp>_<kind>.csv` results file."""
+
+    return os.path.join(output_dir, f"{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{kind}.csv")
+
+# Profile table of a pool worker, set once by `_init_worker`
+_worker_profiles = None
+
+def _init_worker(centers, table, lookup, model_parameters, parser_backend, cache_parameters, instrument):
+    """Receive the profile table and the parent's settings once per pool worker."""
+
+    global _worker_profiles
+    _worker_profiles = (centers, table, lookup)
+    model.configure(**model_parameters)
+    rna_extractor.parser_backend = parser_backend
+    structure_cache.configure(**cache_parameters)
+    instrumentation.enabled = instrument
+
+def _score_worker(struct_file, decompose=False, models=False):
+    """Score one file against the worker's profile table, returning its timing records too."""
+
+    centers, table, lookup = _worker_profiles
+    if models:
+        s, records = instrumentation.collect(score_models, struct_file, centers, table, lookup)
+    else:
+        s, records = instrumentation.collect(score_file, struct_file, centers, table, None, lookup, decompose)
+    return os.path.basename(struct_file), s, records
+
+def run_score(model_dir, testset_dir, output_dir, workers=1, ordered=True, lookup_step=None,
+              decompose=False, models=False):
+    """
+    Score a set of RNA structures against reference profiles and save the results.
+
+    Parameters
+    ----------
+    model_dir : str
+        Path to the folder containing the reference profiles (`profiles.npz` or `.txt` files for base pairs).
+    testset_dir : str
+        Path to the folder containing PDB/CIF files of test RNA structures.
+    output_dir : str
+        Path to the folder where scoring results CSV will be saved.
+    workers : int
+        Number of worker processes; 1 scores the files serially.
+    ordered : bool
+        With several workers, write results in input order (True) or as soon as they complete (False).
+    lookup_step : float, optional
+        Cell width of the dense lookup table of the fast scoring mode (see `load_lookup`).
+    decompose : bool
+        Also write the per-residue and per-pair-type energies next to the scores CSV
+        (see `decomposition_writers`).
+    models : bool
+        Score every model of multi-model files (see `score_models`), writing one row per model
+        with its 1-based index in the file.
+    
+    Returns
+    -------
+    str
+        Path to the written scores CSV.
+    """
+
+    if decompose and models:
+        raise ValueError("Score decomposition is not available when scoring every model")
+
+    # === Load reference profiles ===
+    centers, table, _ = profiles.load_profiles(model_dir, configure=True)
+    lookup = load_lookup(centers, table, lookup_step)
+    report_lookup(lookup)
+
+    # === Load test PDBs/CIFs ===
+    test_files = list_structures(testset_dir)
 
-    # === Save results ===
+    # === Score all test structures, streaming results to the CSV ===
     os.makedirs(output_dir, exist_ok=True)
-    output_file = os.path.join(
-        output_dir,
-        f"{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_scores.csv"
-    )
+    output_file = timestamped_file(output_dir)
+
+    with contextlib.ExitStack() as stack:
+        csvfile = stack.enter_context(open(output_file, "w", newline=""))
+        write_decomposition = decomposition_writers(output_file, stack) if decompose else None
+        writer = csv.writer(csvfile)
+        writer.writerow(["struct_file", "model", "score"] if models else ["struct_file", "score"])
+
+        def write(name, result):
+            if models:
+                print(f" - {name}: {len(result)} models, mean {result.mean():.4f}")
+                writer.writerows((name, k, s) for k, s in enumerate(result.tolist(), start=1))
+                return
+            if decompose:
+                write_decomposition(name, result)
+                result = result[0]
+            print(f" - {name}: {result:.4f}")
+            writer.writerow((name, result))
+
+        if workers > 1 and len(test_files) > 1:
+            chunksize = max(1, len(test_files) // (4 * workers))
+            with multiprocessing.Pool(workers, initializer=_init_worker,
+                                      initargs=(centers, table, lookup, model.parameters(),
+                                                rna_extractor.parser_backend,
+                                                structure_cache.parameters(),
+                                                instrumentation.enabled)) as pool:
+                imap = pool.imap if ordered else pool.imap_unordered
+                worker = partial(_score_worker, decompose=decompose, models=models)
+                for name, result, records in imap(worker, test_files, chunksize):
+                    instrumentation.records.extend(records)
+                    write(name, result)
+        else:
+            for struct_file in test_files:
+                if models:
+                    result = score_models(struct_file, centers, table, lookup)
+                else:
+                    result = score_file(struct_file, centers, table, lookup=lookup, decompose=decompose)
+                write(os.path.basename(struct_file), result)
+
+    print(f"Scores saved to {output_file}")
+    return output_file
+
+def score_channels(struct_file, channel_profiles, lookups=None):
+    """
+    Score one PDB/CIF file against the profiles of several atom channels, parsing it once.
+
+    Parameters
+    ----------
+    struct_file : str
+        Path to the PDB/CIF structure.
+    channel_profiles : list of tuple
+        `(channel, centers, table)` of every channel, as returned by `profiles.load_channels`.
+    lookups : list of tuple, optional
+        Dense lookup table of every channel from `load_lookup` (fast scoring mode).
+
+    Returns
+    -------
+    np.ndarray
+        Score of every channel, in the order of `channel_profiles`; the combined score is their sum.
+    """
+
+    instrumentation.start_file("score", struct_file)
+    channels = [channel for channel, _, _ in channel_profiles]
+    lookups = lookups or [None] * len(channels)
+
+    with instrumentation.stage("parse"):
+        channel_arrays = rna_extractor.extract_channel_arrays(struct_file, channels)
+
+    scores = np.zeros(len(channels))
+    for k, ((_, centers, table), arrays, lookup) in enumerate(zip(channel_profiles, channel_arrays, lookups)):
+        with instrumentation.stage("contacts"):
+            _, _, distances, codes = model.residue_contacts(*arrays)
+        with instrumentation.stage("interpolate"):
+            scores[k] = score_contacts(codes, distances, centers, table, lookup)
+
+    instrumentation.count(atoms=len(channel_arrays[0][2]))
+    return scores
+
+# Channel profiles and lookup tables of a pool worker, set once by `_init_channel_worker`
+_worker_channels = None
+
+def _init_channel_worker(channel_profiles, lookups, *settings):
+    """Receive the profiles of every channel and the parent's settings once per pool worker."""
+
+    global _worker_channels
+    _worker_channels = (channel_profiles, lookups)
+    _init_worker(None, None, None, *settings)
+
+def _score_channels_worker(struct_file):
+    """Score one file against the worker's channel profiles, returning its timing records too."""
+
+    scores, records = instrumentation.collect(score_channels, struct_file, *_worker_channels)
+    return os.path.basename(struct_file), scores, records
+
+def run_score_channels(model_dir, testset_dir, output_dir, channels=None, workers=1, ordered=True,
+                       lookup_step=None):
+    """
+    Score a set of RNA structures against the profiles of several atom channels (see
+    `training.run_train`), writing one column per channel and their sum as the combined score.
+
+    Parameters
+    ----------
+    model_dir : str
+        Path to the folder containing the reference profiles.
+    testset_dir : str
+        Path to the folder containing PDB/CIF files of test RNA structures.
+    output_dir : str
+        Path to the folder where scoring results CSV will be saved.
+    channels : sequence of str, optional
+        Atom channels to score (default: every channel found in `model_dir`).
+    workers : int
+        Number of worker processes; 1 scores the files serially.
+    ordered : bool
+        With several workers, write results in input order (True) or as soon as they complete (False).
+    lookup_step : float, optional
+        Cell width of the dense lookup tables of the fast scoring mode (see `load_lookup`).
+
+    Returns
+    -------
+    str
+        Path to the written scores CSV, with columns `struct_file, score, score_<channel>...`.
+    """
+
+    channel_profiles = profiles.load_channels(model_dir, channels, configure=True)
+    lookups = [load_lookup(centers, table, lookup_step) for _, centers, table in channel_profiles]
+    for lookup in lookups:
+        report_lookup(lookup)
+    names = [channel for channel, _, _ in channel_profiles]
+    print(f"Scoring channels {', '.join(names)}")
+
+    test_files = list_structures(testset_dir)
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = timestamped_file(output_dir)
 
     with open(output_file, "w", newline="") as csvfile:
         writer = csv.writer(csvfile)
-        writer.writerow(["struct_file", "score"])
-        writer.writerows(results)
+        writer.writerow(["struct_file", "score"] + [f"score_{channel}" for channel in names])
+
+        def write(name, scores):
+            print(f" - {name}: {scores.sum():.4f} (" +
+                  ", ".join(f"{channel} {s:.4f}" for channel, s in zip(names, scores)) + ")")
+            writer.writerow([name, float(scores.sum())] + scores.tolist())
+
+        if workers > 1 and len(test_files) > 1:
+            chunksize = max(1, len(test_files) // (4 * workers))
+            with multiprocessing.Pool(workers, initializer=_init_channel_worker,
+                                      initargs=(channel_profiles, lookups, model.parameters(),
+                                                rna_extractor.parser_backend,
+                                                structure_cache.parameters(),
+                                                instrumentation.enabled)) as pool:
+                imap = pool.imap if ordered else pool.imap_unordered
+                for name, scores, records in imap(_score_channels_worker, test_files, chunksize):
+                    instrumentation.records.extend(records)
+                    write(name, scores)
+        else:
+            for struct_file in test_files:
+                write(os.path.basename(struct_file), score_channels(struct_file, channel_profiles, lookups))
 
     print(f"Scores saved to {output_file}")
+    return output_file
+
+def _decoy_source(decoy):
+    """`(name, struct_file, handle)` to score one `(name, path, data)` item of `decoys.iter_structures`."""
+
+    name, path, data = decoy
+    if data is None:
+        return name, path, None
+    return name, name, io.StringIO(data.decode())
+
+def _score_decoy(decoy):
+    """Score one `(name, path, data)` item of `decoys.iter_structures` in a pool worker."""
+
+    centers, table, lookup = _worker_profiles
+    name, struct_file, handle = _decoy_source(decoy)
+    s, records = instrumentation.collect(score_file, struct_file, centers, table, handle, lookup)
+    return name, s, records
+
+def truncate_partial_row(output_file):
+    """Cut a CSV back to its last complete line, dropping a row left half-written by an interrupted run."""
+
+    if not os.path.exists(output_file):
+        return
+    with open(output_file, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+def scored_names(output_file):
+    """Return the set of `struct_file` entries of a scores CSV whose score is a valid number."""
+
+    if not os.path.exists(output_file):
+        return set()
+
+    def scored(row):
+        try:
+            float(row["score"])
+        except (TypeError, ValueError):
+            return False
+        return True
+
+    with open(output_file, newline="") as csvfile:
+        return {row["struct_file"] for row in csv.DictReader(csvfile) if scored(row)}
+
+def run_score_stream(model_dir, source, output_file, pattern="*", recursive=False, resume=False,
+                     workers=1, ordered=True, flush_every=100, lookup_step=None):
+    """
+    Score a very large decoy set with bounded memory, writing each score as it is produced.
+
+    The source is walked lazily (see `decoys.iter_structures`), at most a few batches of
+    decoys are in flight at once, and the CSV is flushed every `flush_every` rows so that an
+    interrupted run loses little work and can be resumed.
+
+    Parameters
+    ----------
+    model_dir : str
+        Path to the folder containing the reference profiles.
+    source : str
+        Folder of PDB/CIF files and/or tar/zip archives, or a single archive.
+    output_file : str
+        Path to the scores CSV.
+    pattern : str
+        Shell-style pattern the structure file names must match.
+    recursive : bool
+        Also walk subfolders of `source`.
+    resume : bool
+        Append to an existing `output_file`, skipping the structures it already lists with a
+        score; a last row cut off by an interrupted run is removed and rescored.
+    workers : int
+        Number of worker processes; 1 scores the files serially.
+    ordered : bool
+        With several workers, write results in input order (True) or as soon as they complete (False).
+    flush_every : int
+        Number of rows between two flushes of the CSV.
+    lookup_step : float, optional
+        Cell width of the dense lookup table of the fast scoring mode (see `load_lookup`).
+
+    Returns
+    -------
+    int
+        Number of structures scored in this run.
+    """
+
+    centers, table, _ = profiles.load_profiles(model_dir, configure=True)
+    lookup = load_lookup(centers, table, lookup_step)
+    report_lookup(lookup)
+
+    if resume:
+        truncate_partial_row(output_file)
+    done = scored_names(output_file) if resume else set()
+    if done:
+        print(f"Resuming: skipping {len(done)} structures already in {output_file}")
+
+    pending = (d for d in decoys.iter_structures(source, pattern, recursive) if d[0] not in done)
+    write_header = not (resume and os.path.exists(output_file) and os.path.getsize(output_file) > 0)
+
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+    scored = 0
+
+    with open(output_file, "a" if resume else "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        if write_header:
+            writer.writerow(["struct_file", "score"])
+
+        def write(name, s):
+            nonlocal scored
+            writer.writerow((name, s))
+            scored += 1
+            if scored % flush_every == 0:
+                csvfile.flush()
+
+        if workers > 1:
+            # Submit bounded batches so that the lazily walked source is never fully materialized
+            chunksize = 16
+            batch_size = 4 * workers * chunksize
+            with multiprocessing.Pool(workers, initializer=_init_worker,
+                                      initargs=(centers, table, lookup, model.parameters(),
+                                                rna_extractor.parser_backend,
+                                                structure_cache.parameters(),
+                                                instrumentation.enabled)) as pool:
+                imap = pool.imap if ordered else pool.imap_unordered
+                while True:
+                    batch = list(islice(pending, batch_size))
+                    if not batch:
+                        break
+                    for name, s, records in imap(_score_decoy, batch, chunksize):
+                        instrumentation.records.extend(records)
+                        write(name, s)
+        else:
+            for decoy in pending:
+                name, struct_file, handle = _decoy_source(decoy)
+                write(name, score_file(struct_file, centers, table, handle, lookup))
+
+    print(f"Scored {scored} structures, scores saved to {output_file}")
+    return scored
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Scoring module for RNA structures")
@@ -144,11 +923,220 @@ if __name__ == "__main__":
         help="Folder to store scoring results (default: data/scores)"
     )
 
+    parser.add_argument(
+        "--max-distance",
+        type=int,
+        default=None,
+        help="Maximum contact distance of text profiles (default: 20); profiles.npz stores the "
+             "value it was trained with, which is used instead and must match if given"
+    )
+
+    parser.add_argument(
+        "--position-skip",
+        type=int,
+        default=None,
+        help="Minimum residue separation of text profiles (default: 4); profiles.npz stores the "
+             "value it was trained with, which is used instead and must match if given"
+    )
+
+    parser.add_argument(
+        "--neighbor-search",
+        choices=model.neighbor_search_methods,
+        default=None,
+        help="Contact search backend: brute-force, cell-list grid or KD-tree (default: brute)"
+    )
+
+    parser.add_argument(
+        "--parser",
+        choices=rna_extractor.parser_backends,
+        default=None,
+        help="Structure parser: streaming fast path, Biopython, or both compared (default: fast)"
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes used for scoring (default: 1)"
+    )
+
+    parser.add_argument(
+        "--unordered",
+        action="store_true",
+        help="With several workers, write scores as they complete instead of in input order"
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Folder of the parsed-structure cache (default: data/cache of the repository)"
+    )
+
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=None,
+        help="Maximum size of the parsed-structure cache in MB (default: 1024)"
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the parsed-structure cache"
+    )
+
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="Empty the parsed-structure cache before running"
+    )
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Streaming mode: walk the test set lazily (folders and tar/zip archives), "
+             "writing each score as it is produced"
+    )
+
+    parser.add_argument(
+        "--recursive",
+        action="store_true",
+        help="Streaming mode: also walk subfolders of the test set"
+    )
+
+    parser.add_argument(
+        "--pattern",
+        default="*",
+        help="Streaming mode: shell pattern the structure file names must match (default: *)"
+    )
+
+    parser.add_argument(
+        "--output-file",
+        default=None,
+        help="Streaming and trajectory modes: scores CSV to write (default: <output>/<timestamp>_scores.csv or _frames.csv)"
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Streaming mode: append to --output-file, skipping structures it already lists"
+    )
+
+    parser.add_argument(
+        "--lookup-step",
+        type=float,
+        default=None,
+        help="Fast scoring mode: resample the profiles once into a dense lookup table with "
+             "cells of this width in Angstrom (e.g. 0.01) instead of interpolating every contact"
+    )
+
+    parser.add_argument(
+        "--decompose",
+        action="store_true",
+        help="Also write per-residue and per-pair-type energies next to the scores CSV"
+    )
+
+    parser.add_argument(
+        "--models",
+        action="store_true",
+        help="Score every model of multi-model files (NMR ensembles, exported trajectories), "
+             "one row per model"
+    )
+
+    parser.add_argument(
+        "--channels",
+        nargs="*",
+        default=None,
+        metavar="ATOM",
+        help="Multi-channel mode: score these atom channels (e.g. \"C3'\" P N1/N9; all trained "
+             "channels if none are listed) and their sum as the combined score"
+    )
+
+    parser.add_argument(
+        "--topology",
+        default=None,
+        help="Trajectory mode: PDB/CIF file with the atoms of --trajectory"
+    )
+
+    parser.add_argument(
+        "--trajectory",
+        default=None,
+        help="Trajectory mode: .npy (frames x atoms x 3) or .dcd coordinates to score frame by frame"
+    )
+
+    parser.add_argument(
+        "--chunk-frames",
+        type=int,
+        default=1000,
+        help="Trajectory mode: number of frames read and scored at once (default: 1000)"
+    )
+
     args = parser.parse_args()
 
+    if args.decompose and args.models:
+        parser.error("--decompose cannot be combined with --models")
+    if args.channels is not None and (args.decompose or args.models):
+        parser.error("--channels cannot be combined with --decompose or --models")
+
+    # Profiles trained with other contact parameters (e.g. a sweep) carry them in profiles.npz
+    stored = {}
+    if os.path.exists(os.path.join(args.model, profiles.profile_file)):
+        stored = profiles.load_profiles(args.model)[2]
+    for name, value in (("max_distance", args.max_distance), ("position_skip", args.position_skip)):
+        if value is not None and name in stored and stored[name] != value:
+            parser.error(f"--{name.replace('_', '-')} {value} differs from the value {stored[name]} "
+                         f"the profiles in {args.model} were trained with")
+
+    if args.max_distance is not None:
+        model.max_distance = args.max_distance
+        model.max_distance_sq = args.max_distance ** 2
+
+    if args.position_skip is not None:
+        model.position_skip = args.position_skip
+
+    if args.neighbor_search is not None:
+        model.neighbor_search = args.neighbor_search
+
+    if args.parser is not None:
+        rna_extractor.parser_backend = args.parser
+
+    if args.cache_dir is not None:
+        structure_cache.cache_dir = args.cache_dir
+
+    if args.cache_size is not None:
+        structure_cache.max_size = args.cache_size * (1 << 20)
+
+    if args.no_cache:
+        structure_cache.enabled = False
+
+    if args.clear_cache:
+        structure_cache.clear()
+
     print("Scoring parameters:")
     print("  model_dir     =", args.model)
     print("  testset_dir   =", args.testset)
     print("  output_dir    =", args.output)
+    print("  max_distance  =", stored.get("max_distance", model.max_distance))
+    print("  position_skip =", stored.get("position_skip", model.position_skip))
+    print("  neighbor_search =", model.neighbor_search)
+    print("  parser        =", rna_extractor.parser_backend)
+    print("  workers       =", args.workers)
+    print("  cache_dir     =", structure_cache.cache_dir if structure_cache.enabled else None)
 
-    run_score(args.model, args.testset, args.output)
+    if args.trajectory:
+        if not args.topology:
+            parser.error("--trajectory requires --topology")
+        output_file = args.output_file or timestamped_file(args.output, "frames")
+        run_score_trajectory(args.model, args.topology, args.trajectory, output_file,
+                             args.chunk_frames, args.lookup_step)
+    elif args.channels is not None:
+        run_score_channels(args.model, args.testset, args.output, args.channels or None,
+                           args.workers, not args.unordered, args.lookup_step)
+    elif args.stream:
+        output_file = args.output_file or timestamped_file(args.output)
+        run_score_stream(args.model, args.testset, output_file, args.pattern, args.recursive,
+                         args.resume, args.workers, not args.unordered,
+                         lookup_step=args.lookup_step)
+    else:
+        run_score(args.model, args.testset, args.output, args.workers, not args.unordered,
+                  args.lookup_step, args.decompose, args.models)
@@ -0,0 +1,293 @@
+import os
+import json
+import stat
+import base64
+import socket
+import signal
+import asyncio
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+import utils.model as model
+import utils.rna_extractor as rna_extractor
+import utils.structure_cache as structure_cache
+import utils.profiles as profiles
+import src.scoring as scoring
+
+# Requests and responses are single JSON objects, one per line:
+#   {"op": "ping"}                                   -> {"ok": true}
+#   {"op": "paths", "paths": ["a.pdb", ...]}         -> {"scores": [...]}
+#   {"op": "coords", "coords": [[x, y, z], ...],
+#    "residues": "GGACU...", "chains": [...]}        -> {"score": ...}
+# "chains" is optional (one chain). Instead of "coords", "coords_b64" may hold the base64 of the
+# little-endian float64 coordinates, much cheaper to encode and decode than JSON numbers.
+# Any request may carry an "id", echoed in the response.
+# Failed requests get {"error": "<message>"} and the connection stays open.
+
+# Largest accepted request line, in bytes
+request_limit = 1 << 28
+
+def _score_path(path):
+    """Score a structure file against the profiles loaded by `scoring._init_worker`."""
+
+    centers, table, lookup = scoring._worker_profiles
+    return scoring.score_file(path, centers, table, lookup=lookup)
+
+def _score_coords(chains, residues, coords):
+    """Score one structure given as arrays against the profiles loaded by `scoring._init_worker`."""
+
+    centers, table, lookup = scoring._worker_profiles
+    _, _, distances, codes = model.residue_contacts(chains, residues, coords)
+    return scoring.score_contacts(codes, distances, centers, table, lookup)
+
+def decode_coords(request):
+    """
+    Convert a "coords" request into the `(chains, residues, coords)` arrays used for scoring.
+
+    Parameters
+    ----------
+    request : dict
+        Request with `coords` (n x 3) or `coords_b64`, `residues` (string or list of n
+        nucleotides) and optionally `chains` (n chain identifiers, numbered by first appearance).
+
+    Returns
+    -------
+    tuple
+        `(chains, residues, coords)` arrays.
+    """
+
+    if "coords_b64" in request:
+        coords = np.frombuffer(base64.b64decode(request["coords_b64"]), dtype="<f8").reshape(-1, 3)
+    else:
+        coords = np.asarray(request["coords"], dtype=float).reshape(-1, 3)
+    residues = model.encode_residues(request["residues"])
+    if len(residues) != len(coords):
+        raise ValueError(f"Got {len(coords)} coordinates for {len(residues)} residues")
+
+    chain_ids = request.get("chains")
+    if chain_ids is None:
+        chains = np.zeros(len(coords), dtype=np.intp)
+    else:
+        codes = {}
+        chains = np.fromiter((codes.setdefault(c, len(codes)) for c in chain_ids), dtype=np.intp)
+        if len(chains) != len(coords):
+            raise ValueError(f"Got {len(chains)} chain identifiers for {len(coords)} residues")
+
+    return chains, residues, coords
+
+class ScoringServer:
+    """
+    Scoring daemon keeping the profiles loaded between requests.
+
+    Structures are scored in the event loop itself when `workers` is 0, which gives the lowest
+    latency for small structures, or on a pool of `workers` processes otherwise.
+
+    Parameters
+    ----------
+    model_dir : str
+        Path to the folder containing the reference profiles.
+    workers : int
+        Number of worker processes; 0 scores in the server process.
+    lookup_step : float, optional
+        Cell width of the dense lookup table of the fast scoring mode (see `scoring.load_lookup`).
+    """
+
+    def __init__(self, model_dir, workers=0, lookup_step=None):
+        centers, table, _ = profiles.load_profiles(model_dir, configure=True)
+        lookup = scoring.load_lookup(centers, table, lookup_step)
+        initargs = (centers, table, lookup, model.parameters(), rna_extractor.parser_backend,
+                    structure_cache.parameters(), False)
+
+        scoring._init_worker(*initargs)
+        self.pool = (ProcessPoolExecutor(workers, initializer=scoring._init_worker, initargs=initargs)
+                     if workers > 0 else None)
+        self.server = None
+        self.connections = set()
+
+    async def _run(self, func, *args):
+        if self.pool is None:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+
+    async def handle_request(self, request):
+        """Answer one decoded request, see the protocol at the top of this module."""
+
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True}
+        if op == "paths":
+            # One task per file, so that a pool scores the files of a request in parallel
+            scores = await asyncio.gather(*(self._run(_score_path, path) for path in request["paths"]))
+            return {"scores": list(scores)}
+        if op == "coords":
+            return {"score": await self._run(_score_coords, *decode_coords(request))}
+        raise ValueError(f"Unknown operation {op!r}")
+
+    async def _handle_connection(self, reader, writer):
+        self.connections.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = {}
+                try:
+                    request = json.loads(line)
+                    response = await self.handle_request(request)
+                except Exception as err:
+                    response = {"error": f"{type(err).__name__}: {err}"}
+                if isinstance(request, dict) and "id" in request:
+                    response["id"] = request["id"]
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (asyncio.CancelledError, ConnectionError):
+            # Server shutting down or client gone: nothing left to answer
+            pass
+        finally:
+            self.connections.discard(writer)
+            writer.close()
+
+    async def start(self, socket_path=None, host="127.0.0.1", port=0):
+        """
+        Start listening on a Unix domain socket, or on a localhost TCP port if `socket_path` is None.
+
+        Returns
+        -------
+        str or tuple
+            The socket path, or the `(host, port)` actually bound.
+        """
+
+        if socket_path is not None:
+            # Only replace a stale socket left by a previous server, never another file
+            if os.path.exists(socket_path):
+                if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                    raise FileExistsError(f"{socket_path} exists and is not a socket")
+                os.remove(socket_path)
+            self.server = await asyncio.start_unix_server(self._handle_connection, socket_path,
+                                                          limit=request_limit)
+            return socket_path
+        self.server = await asyncio.start_server(self._handle_connection, host, port, limit=request_limit)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        """Stop listening, close the open connections and shut the worker pool down."""
+
+        if self.server is not None:
+            self.server.close()
+            for writer in list(self.connections):
+                writer.close()
+            await self.server.wait_closed()
+        if self.pool is not None:
+            self.pool.shutdown()
+
+class ScoringClient:
+    """
+    Blocking client of a `ScoringServer`, keeping one connection open.
+
+    Parameters
+    ----------
+    address : str or tuple
+        Unix socket path, or `(host, port)`.
+    """
+
+    def __init__(self, address):
+        if isinstance(address, str):
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.socket.connect(address)
+        self.stream = self.socket.makefile("rwb")
+
+    def request(self, request):
+        """Send one request and return the decoded response, raising RuntimeError on server errors."""
+
+        self.stream.write(json.dumps(request).encode() + b"\n")
+        self.stream.flush()
+        line = self.stream.readline()
+        if not line:
+            raise ConnectionError("Scoring server closed the connection")
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response
+
+    def score_files(self, paths):
+        """Score PDB/CIF files, given as paths readable by the server."""
+
+        return self.request({"op": "paths", "paths": [os.path.abspath(p) for p in paths]})["scores"]
+
+    def score_coords(self, coords, residues, chains=None):
+        """Score one structure given as `(n, 3)` C3' coordinates, n nucleotides and optionally n chain ids."""
+
+        packed = np.ascontiguousarray(coords, dtype="<f8").tobytes()
+        request = {"op": "coords", "coords_b64": base64.b64encode(packed).decode("ascii"),
+                   "residues": "".join(residues) if not isinstance(residues, str) else residues}
+        if chains is not None:
+            request["chains"] = list(chains)
+        return self.request(request)["score"]
+
+    def close(self):
+        try:
+            self.stream.close()
+        except OSError:
+            # Unsent data of a connection already closed by the server
+            pass
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+async def serve(model_dir, socket_path=None, host="127.0.0.1", port=0, workers=0, lookup_step=None):
+    """Run a `ScoringServer` until cancelled or interrupted (SIGINT/SIGTERM)."""
+
+    server = ScoringServer(model_dir, workers, lookup_step)
+    address = await server.start(socket_path, host, port)
+    print(f"Scoring server listening on {address}", flush=True)
+
+    task = asyncio.current_task()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        asyncio.get_running_loop().add_signal_handler(sig, task.cancel)
+
+    try:
+        await server.server.serve_forever()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await server.close()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scoring daemon keeping the profiles loaded between requests")
+
+    parser.add_argument("--model", default="data/profiles",
+                        help="Folder containing trained model profiles (default: data/profiles)")
+
+    parser.add_argument("--socket", default=None,
+                        help="Unix domain socket to listen on (default: localhost TCP, see --port)")
+
+    parser.add_argument("--port", type=int, default=8765,
+                        help="Localhost TCP port to listen on when --socket is not given (default: 8765)")
+
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Number of worker processes; 0 scores in the server process (default: 0)")
+
+    parser.add_argument("--lookup-step", type=float, default=None,
+                        help="Fast scoring: dense lookup table with cells of this width in Angstrom")
+
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Bypass the parsed-structure cache")
+
+    args = parser.parse_args()
+
+    if args.no_cache:
+        structure_cache.enabled = False
+
+    asyncio.run(serve(args.model, args.socket, port=args.port, workers=args.workers,
+                      lookup_step=args.lookup_step))
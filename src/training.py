@@ -1,85 +1,273 @@
 import os
 import argparse
+import json
+import time
+import multiprocessing
+from functools import partial
+from itertools import product
 import numpy as np
 from math import ceil
 
 import utils.rna_extractor as rna_extractor
 import utils.model as model
+import utils.structure_cache as structure_cache
+import utils.profiles as profiles
+import utils.instrumentation as instrumentation
+
+def _init_worker(model_parameters, parser_backend, cache_parameters, instrument):
+    """Apply the parent's model, parser, cache and instrumentation settings in a pool worker."""
+
+    model.configure(**model_parameters)
+    rna_extractor.parser_backend = parser_backend
+    structure_cache.configure(**cache_parameters)
+    instrumentation.enabled = instrument
+
+def _map_structures(func, struct_list, workers=1):
+    """Yield `func(struct_file)` for every file in input order, optionally over a process pool."""
+
+    if workers > 1 and len(struct_list) > 1:
+        chunksize = max(1, len(struct_list) // (4 * workers))
+        with multiprocessing.Pool(workers, initializer=_init_worker,
+                                  initargs=(model.parameters(), rna_extractor.parser_backend,
+                                            structure_cache.parameters(),
+                                            instrumentation.enabled)) as pool:
+            for result, records in pool.imap(partial(instrumentation.collect, func), struct_list, chunksize):
+                instrumentation.records.extend(records)
+                yield result
+    else:
+        for struct_file in struct_list:
+            yield func(struct_file)
+
+def structure_counts(struct_file, channels=None):
+    """
+    Compute the reference and base pair-specific distance histograms of one structure.
+
+    Parameters
+    ----------
+    struct_file : str
+        Path to a PDB/CIF structure.
+    channels : sequence of str, optional
+        Atom channels (see `rna_extractor.channel_atoms`) read in a single parse; the C3'
+        atoms only if None.
 
-def train(struct_list):
+    Returns
+    -------
+    tuple or list of tuple
+        `(reference_counts, pair_counts)` as returned by `model.contact_counts`, or a list
+        of them, one per channel, when `channels` is given.
     """
-    Train an objective function by computing interatomic distance distributions from a set of RNA structures.
+
+    instrumentation.start_file("train", struct_file)
+
+    with instrumentation.stage("parse"):
+        if channels is None:
+            channel_arrays = [rna_extractor.extract_c3_arrays(struct_file)]
+        else:
+            channel_arrays = rna_extractor.extract_channel_arrays(struct_file, channels)
+    # Contacts are binned block by block, so large complexes never hold all their distances;
+    # the search of every block is timed as "contacts", its binning as "histogram"
+    counts = []
+    for arrays in channel_arrays:
+        reference_counts, pair_counts = model.contact_counts(np.empty(0), np.empty(0, dtype=np.intp))
+        blocks = model.contact_blocks(*arrays)
+        while True:
+            with instrumentation.stage("contacts"):
+                block = next(blocks, None)
+            if block is None:
+                break
+            with instrumentation.stage("histogram"):
+                block_reference, block_pairs = model.contact_counts(*block)
+                reference_counts += block_reference
+                pair_counts += block_pairs
+        counts.append((reference_counts, pair_counts))
+
+    instrumentation.count(atoms=len(channel_arrays[0][2]), contacts=int(counts[0][0].sum()))
+    return counts[0] if channels is None else counts
+
+def accumulate_counts(struct_list, workers=1):
+    """
+    Sum the distance histograms of a set of structures, optionally over a process pool.
 
     Parameters
     ----------
     struct_list : list
-        List of file paths to PDB/CIF structures used for training.
+        List of file paths to PDB/CIF structures.
+    workers : int
+        Number of worker processes; 1 processes the files serially.
 
     Returns
     -------
-    dict
-        Dictionary of score distributions for each base pair.
+    tuple
+        `(sum_reference_counts, sum_pair_counts)` float arrays of shape `(num_bins,)` and
+        `(len(model.base_pairs), num_bins)`. Counts are integers, so the result does not
+        depend on the number of workers.
     """
 
     num_bins = model.num_bins
 
     # Initialize global counts 
     sum_reference_counts = np.zeros(num_bins, dtype=float)     # >>> changed
-    sum_pair_counts = {bp: np.zeros(num_bins, dtype=float) for bp in model.base_pairs}  # >>> changed
+    sum_pair_counts = np.zeros((len(model.base_pairs), num_bins), dtype=float)  # rows ordered as model.base_pairs
 
     # Aggregate counts from all PDB/CIF files
-    for struct_file in struct_list:
-        atoms = rna_extractor.extract_c3_atoms(struct_file)
+    for reference_counts, pair_counts in _map_structures(structure_counts, struct_list, workers):
+        sum_reference_counts += reference_counts
+        sum_pair_counts += pair_counts
+
+    return sum_reference_counts, sum_pair_counts
+
+def train(struct_list, workers=1):
+    """
+    Train an objective function by computing interatomic distance distributions from a set of RNA structures.
+
+    Parameters
+    ----------
+    struct_list : list
+        List of file paths to PDB/CIF structures used for training.
+    workers : int
+        Number of worker processes used to compute the distance histograms.
+
+    Returns
+    -------
+    dict
+        Dictionary of score distributions for each base pair.
+    """
+
+    sum_reference_counts, sum_pair_counts = accumulate_counts(struct_list, workers)
+
+    return profile_scores(sum_reference_counts, sum_pair_counts)
 
-        reference_counts, pair_counts = model.distance_counts(atoms)
+def score_tables(reference_counts, pair_counts, bin_width=None):
+    """
+    Convert stacked distance histograms into score tables u = -log(f_pair / f_ref).
 
-        sum_reference_counts += np.asarray(reference_counts, dtype=float)
+    When `model.kde_bandwidth` is set, the histograms are first turned into Gaussian kernel
+    density estimates on the same grid (see `model.smooth_counts`).
 
-        for bp in model.base_pairs:
-            sum_pair_counts[bp] += np.asarray(pair_counts[bp], dtype=float)
+    Parameters
+    ----------
+    reference_counts : np.ndarray
+        `(..., num_bins)` reference counts per distance bin.
+    pair_counts : np.ndarray
+        `(..., len(model.base_pairs), num_bins)` counts per base pair and distance bin,
+        with the same leading axes (e.g. one per resampling replicate).
+    bin_width : float, optional
+        Width of the distance bins (default: `model.bin_width`).
 
-    # Compute reference frequency distribution
-    reference_freq = model.frequencies(sum_reference_counts)
+    Returns
+    -------
+    np.ndarray
+        `(..., len(model.base_pairs), num_bins)` scores, rows ordered as `model.base_pairs`.
+    """
 
-    # Compute pair-based distributions
-    scores = {}
-    for bp in model.base_pairs:
-        pair_freq = model.frequencies(sum_pair_counts[bp])
+    reference_counts = model.smooth_counts(reference_counts, bin_width=bin_width)
+    pair_counts = model.smooth_counts(pair_counts, bin_width=bin_width)
 
-        ref = reference_freq
-        pf = pair_freq
-        u = np.empty_like(ref)
+    # Normalized frequencies, all zero for empty histograms (see `model.frequencies`)
+    def frequencies(counts):
+        totals = counts.sum(axis=-1, keepdims=True)
+        return np.divide(counts, totals, out=np.zeros_like(counts), where=totals != 0)
 
-        mask_zero = (ref == 0) | (pf == 0)
+    reference_freq = frequencies(reference_counts)[..., None, :]
+    pair_freq = frequencies(pair_counts)
 
-        with np.errstate(divide="ignore", invalid="ignore"):
-            ratio = np.divide(pf, ref, out=np.zeros_like(pf), where=~mask_zero)
-            u_raw = -np.log(ratio)
+    mask_zero = (reference_freq == 0) | (pair_freq == 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.divide(pair_freq, reference_freq, out=np.zeros_like(pair_freq), where=~mask_zero)
+        u = -np.log(ratio)
 
-        u[:] = u_raw
-        u[mask_zero] = model.maximum_score
-        u[np.isnan(u) | (u > model.maximum_score)] = model.maximum_score
+    u[mask_zero] = model.maximum_score
+    u[np.isnan(u) | (u > model.maximum_score)] = model.maximum_score
+    return u
 
-        scores[bp] = u.tolist()
+def profile_scores(sum_reference_counts, sum_pair_counts, bin_width=None):
+    """
+    Convert summed distance histograms into score profiles u = -log(f_pair / f_ref).
 
-    return scores
+    When `model.kde_bandwidth` is set, the histograms are first turned into Gaussian kernel
+    density estimates on the same grid (see `model.smooth_counts`).
 
-def run_train(train_dir, profile_dir):
+    Parameters
+    ----------
+    sum_reference_counts : np.ndarray
+        Reference counts per distance bin.
+    sum_pair_counts : np.ndarray
+        `(len(model.base_pairs), num_bins)` counts per base pair and distance bin.
+    bin_width : float, optional
+        Width of the distance bins (default: `model.bin_width`).
+
+    Returns
+    -------
+    dict
+        Dictionary of score distributions for each base pair.
     """
-    Train score distributions from a dataset of PDB structures and save the results to profile files.
+
+    table = score_tables(sum_reference_counts, sum_pair_counts, bin_width)
+    return {bp: table[code].tolist() for code, bp in enumerate(model.base_pairs)}
+
+def write_profiles(profile_dir, distributions, parameters=None, text=True):
+    """
+    Save score distributions as a binary `profiles.npz` plus, optionally, one `<pair>.txt` file per base pair.
 
     Parameters
     ----------
-    train_dir : str
-        Path to the folder containing PDB files used for training.
     profile_dir : str
-        Path to the folder where the computed profile `.txt` files will be saved.
+        Path to the folder where the profiles are written.
+    distributions : dict
+        Dictionary of score distributions for each base pair.
+    parameters : dict, optional
+        Training parameters `max_distance`, `bin_width`, `position_skip`, `maximum_score`
+        and optionally `kde_bandwidth` (default: the current `model` parameters).
+    text : bool
+        Also write the tab-separated `.txt` profiles.
 
     Returns
     -------
     None
     """
 
+    if parameters is None:
+        parameters = model.parameters()
+
+    table = np.array([distributions[bp] for bp in model.base_pairs], dtype=float)
+
+    # >>> added: compute bin centers
+    distance_range = (np.arange(table.shape[1]) + 0.5) * parameters["bin_width"]
+
+    profiles.save_profiles(profile_dir, distance_range, table, parameters, text)
+
+def read_file_list(list_file):
+    """
+    Read a list of structure files, one path per line.
+
+    Blank lines and lines starting with `#` are skipped; relative paths are relative to the
+    folder of the list file.
+
+    Parameters
+    ----------
+    list_file : str
+        Path to the text file.
+
+    Returns
+    -------
+    list
+        Paths of the listed structures.
+    """
+
+    base = os.path.dirname(os.path.abspath(list_file))
+    with open(list_file) as f:
+        entries = [line.strip() for line in f]
+    return [os.path.join(base, entry) for entry in entries if entry and not entry.startswith("#")]
+
+def _structure_files(train_dir):
+    """List the PDB/CIF files of a training folder, or the files of a list file (see `read_file_list`)."""
+
+    if os.path.isfile(train_dir):
+        train_files = read_file_list(train_dir)
+        if not train_files:
+            raise RuntimeError(f"No structure files listed in {train_dir}")
+        return train_files
+
     if not os.path.isdir(train_dir):
         raise FileNotFoundError(f"Dataset folder {train_dir} not found")
 
@@ -92,29 +280,435 @@ def run_train(train_dir, profile_dir):
     if not train_files:
         raise RuntimeError(f"No PDB/CIF files found in {train_dir}")
 
-    # Train
-    distributions = train(train_files)
+    return train_files
+
+# Minimum number of seconds between two progress lines of `report_progress`
+progress_interval = 10.0
+
+def report_progress(results, total, label="files"):
+    """
+    Pass through an iterator of per-file results, printing the progress of a long run.
+
+    A line with the number of processed items, the rate and the estimated remaining time is
+    printed at most every `progress_interval` seconds, and once at the end.
+
+    Parameters
+    ----------
+    results : iterable
+        Results, one per processed item.
+    total : int
+        Expected number of items.
+    label : str
+        Name of the items in the progress lines.
+
+    Yields
+    ------
+    object
+        The items of `results`, unchanged.
+    """
+
+    start = last = time.perf_counter()
+    done = 0
+    for result in results:
+        done += 1
+        now = time.perf_counter()
+        if now - last >= progress_interval or done == total:
+            last = now
+            rate = done / max(now - start, 1e-9)
+            eta = (total - done) / rate
+            print(f"  {done}/{total} {label} ({100 * done / max(total, 1):.1f}%), "
+                  f"{rate:.1f} {label}/s, ETA {int(eta // 60)}m {int(eta % 60):02d}s", flush=True)
+        yield result
+
+# Raw counts and manifest persisted next to the profiles for `run_train(..., update=True)`
+counts_file = "counts.npz"
+manifest_file = "manifest.json"
+count_parameters = ("max_distance", "bin_width", "position_skip", "num_bins")
+
+def file_signature(struct_file):
+    """Return the `(size, mtime_ns)` of a file, used to detect changed training structures."""
+
+    stat = os.stat(struct_file)
+    return stat.st_size, stat.st_mtime_ns
+
+def save_counts(profile_dir, file_counts):
+    """
+    Persist per-file distance histograms and the manifest of contributing files.
+
+    Parameters
+    ----------
+    profile_dir : str
+        Path to the profile folder.
+    file_counts : dict
+        Mapping of absolute file path to `(signature, reference_counts, pair_counts)`.
+
+    Returns
+    -------
+    None
+    """
 
-    # Save profile output
     os.makedirs(profile_dir, exist_ok=True)
+    files = sorted(file_counts)
+    num_bins = model.num_bins
+
+    np.savez_compressed(
+        os.path.join(profile_dir, counts_file),
+        files=np.array(files, dtype=str),
+        reference_counts=np.array([file_counts[f][1] for f in files], dtype=np.int64).reshape(-1, num_bins),
+        pair_counts=np.array([file_counts[f][2] for f in files],
+                             dtype=np.int64).reshape(-1, len(model.base_pairs), num_bins),
+    )
+
+    manifest = {
+        "parameters": {name: getattr(model, name) for name in count_parameters},
+        "files": [{"path": f, "size": file_counts[f][0][0], "mtime_ns": file_counts[f][0][1]}
+                  for f in files],
+    }
+    with open(os.path.join(profile_dir, manifest_file), "w") as f:
+        json.dump(manifest, f, indent=1)
+
+def load_counts(profile_dir):
+    """
+    Load the per-file distance histograms saved by `save_counts`.
+
+    Parameters
+    ----------
+    profile_dir : str
+        Path to the profile folder.
+
+    Returns
+    -------
+    dict
+        Mapping of absolute file path to `(signature, reference_counts, pair_counts)`.
+    """
 
-    # for bp in model.base_pairs:
-    #     output_file = os.path.join(profile_dir, f"{bp}.txt")
-    #     with open(output_file, "w") as f:
-    #         for value in distributions[bp]:
-    #             f.write(f"{value}\n")
+    with open(os.path.join(profile_dir, manifest_file)) as f:
+        manifest = json.load(f)
 
-    for bp in model.base_pairs:
-        output_file = os.path.join(profile_dir, f"{bp}.txt")
-        with open(output_file, "w") as f:
+    current = {name: getattr(model, name) for name in count_parameters}
+    if manifest["parameters"] != current:
+        raise ValueError(f"Counts in {profile_dir} were computed with {manifest['parameters']}, "
+                         f"not the current parameters {current}; retrain without update")
 
-            # >>> added: compute bin centers
-            distance_range = (np.arange(model.num_bins) + 0.5) * model.bin_width
+    with np.load(os.path.join(profile_dir, counts_file)) as data:
+        files = list(data["files"])
+        reference_counts = data["reference_counts"]
+        pair_counts = data["pair_counts"]
 
-            for dist, value in zip(distance_range, distributions[bp]):
-                f.write(f"{dist:.6f}\t{value}\n")
+    signatures = {entry["path"]: (entry["size"], entry["mtime_ns"]) for entry in manifest["files"]}
+    return {f: (signatures[f], reference_counts[k], pair_counts[k]) for k, f in enumerate(files)}
 
-    print(f"Profiles saved to {profile_dir}")
+def run_train(train_dir, profile_dir, workers=1, text=True, update=False, channels=None):
+    """
+    Train score distributions from a dataset of PDB structures and save the results to profile files.
+
+    Besides the profiles, the raw per-file counts (`counts.npz`) and the list of contributing
+    files (`manifest.json`) are saved, so that a later update only processes new or changed files.
+    With several atom `channels`, every file is parsed once for all channels and each channel
+    gets its own profiles, counts and manifest in `profiles.channel_dir(profile_dir, channel)`.
+
+    Parameters
+    ----------
+    train_dir : str
+        Path to the folder containing PDB files used for training, or to a text file listing
+        them (e.g. a whole PDB archive, see `read_file_list`).
+    profile_dir : str
+        Path to the folder where the computed profile `.txt` files will be saved.
+    workers : int
+        Number of worker processes used to process the training structures.
+    text : bool
+        Also write the tab-separated `.txt` profiles next to `profiles.npz`.
+    update : bool
+        Reuse the counts saved in `profile_dir`: only new or changed files are parsed,
+        and files no longer in `train_dir` are dropped.
+    channels : sequence of str, optional
+        Atom channels to train (see `rna_extractor.channel_atoms`); the C3' atoms only if None.
+
+    Returns
+    -------
+    None
+    """
+
+    train_files = [os.path.abspath(f) for f in _structure_files(train_dir)]
+    channel_dirs = [profile_dir] if channels is None else [profiles.channel_dir(profile_dir, channel)
+                                                           for channel in channels]
+
+    channel_counts = []
+    for channel_path in channel_dirs:
+        file_counts = {}
+        if update and os.path.exists(os.path.join(channel_path, manifest_file)):
+            previous = load_counts(channel_path)
+            file_counts = {f: previous[f] for f in train_files
+                           if f in previous and previous[f][0] == tuple(file_signature(f))}
+        channel_counts.append(file_counts)
+
+    # A file missing from any channel is parsed again for all of them
+    pending = [f for f in train_files if any(f not in file_counts for file_counts in channel_counts)]
+    print(f"Training on {len(train_files)} files ({len(pending)} new or changed)")
+
+    # Train
+    count = structure_counts if channels is None else partial(structure_counts, channels=channels)
+    for struct_file, counts in report_progress(
+            zip(pending, _map_structures(count, pending, workers)), len(pending)):
+        signature = file_signature(struct_file)
+        for file_counts, (reference_counts, pair_counts) in zip(channel_counts,
+                                                               [counts] if channels is None else counts):
+            file_counts[struct_file] = (signature, reference_counts, pair_counts)
+
+    num_bins = model.num_bins
+    for k, (channel_path, file_counts) in enumerate(zip(channel_dirs, channel_counts)):
+        sum_reference_counts = np.zeros(num_bins, dtype=float)
+        sum_pair_counts = np.zeros((len(model.base_pairs), num_bins), dtype=float)
+        for struct_file in sorted(file_counts):
+            _, reference_counts, pair_counts = file_counts[struct_file]
+            sum_reference_counts += reference_counts
+            sum_pair_counts += pair_counts
+
+        distributions = profile_scores(sum_reference_counts, sum_pair_counts)
+
+        # Save profile output
+        parameters = model.parameters()
+        if channels is not None:
+            parameters["channel"] = channels[k]
+        write_profiles(channel_path, distributions, parameters, text=text)
+        save_counts(channel_path, file_counts)
+
+        print(f"Profiles saved to {channel_path}")
+
+resampling_methods = ("bootstrap", "kfold")
+
+def resampling_weights(num_files, method="bootstrap", replicates=100, folds=5, seed=0):
+    """
+    Draw the weight of every training file in every resampled training set.
+
+    Parameters
+    ----------
+    num_files : int
+        Number of training files.
+    method : str
+        "bootstrap": `replicates` samples of `num_files` files drawn with replacement, a file
+        weighing the number of times it was drawn; "kfold": the files are shuffled into
+        `folds` folds and replicate k trains on all folds but k (weight 0 for held-out files).
+    replicates : int
+        Number of bootstrap replicates.
+    folds : int
+        Number of cross-validation folds.
+    seed : int
+        Seed of the random generator.
+
+    Returns
+    -------
+    np.ndarray
+        `(num_replicates, num_files)` integer weights.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    if method == "bootstrap":
+        return rng.multinomial(num_files, np.full(num_files, 1.0 / num_files), size=replicates)
+
+    if method == "kfold":
+        if not 2 <= folds <= num_files:
+            raise ValueError(f"Cannot split {num_files} files into {folds} folds")
+        fold_of = np.empty(num_files, dtype=np.intp)
+        fold_of[rng.permutation(num_files)] = np.arange(num_files) % folds
+        return (fold_of[None, :] != np.arange(folds)[:, None]).astype(np.int64)
+
+    raise ValueError(f"Unknown resampling method {method!r}, expected one of {resampling_methods}")
+
+def resample_profiles(reference_counts, pair_counts, weights, bin_width=None):
+    """
+    Compute the score tables of resampled training sets from per-file histograms.
+
+    The histograms of every replicate are weighted sums of the per-file histograms, computed
+    for all replicates at once as matrix products; no structure is parsed again.
+
+    Parameters
+    ----------
+    reference_counts : np.ndarray
+        `(num_files, num_bins)` per-file reference counts.
+    pair_counts : np.ndarray
+        `(num_files, len(model.base_pairs), num_bins)` per-file pair counts.
+    weights : np.ndarray
+        `(num_replicates, num_files)` file weights, see `resampling_weights`.
+    bin_width : float, optional
+        Width of the distance bins (default: `model.bin_width`).
+
+    Returns
+    -------
+    np.ndarray
+        `(num_replicates, len(model.base_pairs), num_bins)` score tables.
+    """
+
+    weights = np.asarray(weights, dtype=float)
+    sum_reference_counts = weights @ np.asarray(reference_counts, dtype=float)
+    sum_pair_counts = np.tensordot(weights, np.asarray(pair_counts, dtype=float), axes=1)
+    return score_tables(sum_reference_counts, sum_pair_counts, bin_width)
+
+def run_resample(train_dir, profile_dir, method="bootstrap", replicates=100, folds=5, seed=0, workers=1, text=True):
+    """
+    Estimate the robustness of the profiles by bootstrap or k-fold resampling of the training set.
+
+    The per-file histograms are computed once, or updated, by `run_train(..., update=True)`
+    (which also refreshes the full-set profiles) and every replicate is derived from them.
+    Results are saved to `<profile_dir>/resampling_<method>.npz` (files, weights, score table
+    of every replicate, per-bin mean and variance) and the per-bin mean and variance to
+    `<profile_dir>/resampling_<method>.csv`.
+
+    Parameters
+    ----------
+    train_dir : str
+        Path to the folder containing the training structures, or to a list file.
+    profile_dir : str
+        Path to the profile folder holding `counts.npz`.
+    method : str
+        "bootstrap" or "kfold", see `resampling_weights`.
+    replicates : int
+        Number of bootstrap replicates.
+    folds : int
+        Number of cross-validation folds.
+    seed : int
+        Seed of the random generator.
+    workers : int
+        Number of worker processes used to process new or changed training structures.
+    text : bool
+        Also write the tab-separated `.txt` profiles of the full training set.
+
+    Returns
+    -------
+    tuple
+        `(mean, variance)` arrays of shape `(len(model.base_pairs), num_bins)`.
+    """
+
+    run_train(train_dir, profile_dir, workers, text, update=True)
+
+    file_counts = load_counts(profile_dir)
+    files = sorted(file_counts)
+    reference_counts = np.array([file_counts[f][1] for f in files])
+    pair_counts = np.array([file_counts[f][2] for f in files])
+
+    weights = resampling_weights(len(files), method, replicates, folds, seed)
+    tables = resample_profiles(reference_counts, pair_counts, weights)
+    mean = tables.mean(axis=0)
+    variance = tables.var(axis=0, ddof=1) if len(tables) > 1 else np.zeros_like(mean)
+    centers = (np.arange(model.num_bins) + 0.5) * model.bin_width
+
+    stem = os.path.join(profile_dir, f"resampling_{method}")
+    np.savez_compressed(f"{stem}.npz", files=np.array(files, dtype=str), weights=weights,
+                        centers=centers, tables=tables, mean=mean, variance=variance)
+
+    with open(f"{stem}.csv", "w") as f:
+        f.write("pair,distance,mean,variance\n")
+        for code, bp in enumerate(model.base_pairs):
+            for center, m, v in zip(centers, mean[code], variance[code]):
+                f.write(f"{bp},{center:g},{m:.6f},{v:.6f}\n")
+
+    print(f"{len(tables)} {method} replicates of {len(files)} files; mean standard deviation per pair:")
+    for code, bp in enumerate(model.base_pairs):
+        print(f"  {bp}: {np.sqrt(variance[code]).mean():.4f}")
+    print(f"Resampling results saved to {stem}.npz and {stem}.csv")
+    return mean, variance
+
+def sweep_counts(struct_file, configs):
+    """
+    Compute the distance histograms of one structure for several training configurations.
+
+    Contacts are computed once, at the largest `max_distance` and smallest `position_skip`
+    of `configs`, and filtered down for every configuration.
+
+    Parameters
+    ----------
+    struct_file : str
+        Path to a PDB/CIF structure.
+    configs : list of tuple
+        `(max_distance, bin_width, position_skip)` configurations.
+
+    Returns
+    -------
+    list of tuple
+        `(reference_counts, pair_counts)` for every configuration, in the order of `configs`.
+    """
+
+    largest = max(md for md, _, _ in configs)
+    smallest = min(ps for _, _, ps in configs)
+
+    chains, residues, coords = rna_extractor.extract_c3_arrays(struct_file)
+
+    saved = model.parameters()
+    model.configure(max_distance=largest, max_distance_sq=largest * largest, position_skip=smallest)
+    try:
+        i, j, distances, codes = model.residue_contacts(chains, residues, coords)
+    finally:
+        model.configure(**saved)
+
+    # Recompute squared distances the way residue_contacts does, so that the
+    # cutoff test of every configuration matches a separate training run exactly
+    diff = coords[j] - coords[i]
+    d2 = np.sum(diff * diff, axis=1)
+    separation = j - i
+
+    counts = []
+    for max_distance, bin_width, position_skip in configs:
+        keep = (d2 < max_distance * max_distance) & (separation >= position_skip)
+        counts.append(model.contact_counts(distances[keep], codes[keep],
+                                           bin_width, ceil(max_distance / bin_width)))
+    return counts
+
+def sweep_directory(max_distance, bin_width, position_skip):
+    """Name of the profile subdirectory of one sweep configuration."""
+
+    return f"md{max_distance:g}_bw{bin_width:g}_ps{position_skip}"
+
+def run_sweep(train_dir, profile_dir, max_distances, bin_widths, position_skips, workers=1, text=True):
+    """
+    Train profiles for every combination of parameters in a single pass over the training set.
+
+    Each structure is parsed and its contacts computed once; the histograms of every
+    configuration are derived from them. Profiles of each configuration are written to
+    `<profile_dir>/md<max_distance>_bw<bin_width>_ps<position_skip>/`.
+
+    Parameters
+    ----------
+    train_dir : str
+        Path to the folder containing PDB files used for training.
+    profile_dir : str
+        Path to the folder under which one profile folder per configuration is written.
+    max_distances : list of float
+        Distance cutoffs to train.
+    bin_widths : list of float
+        Histogram bin widths to train.
+    position_skips : list of int
+        Minimum residue separations to train.
+    workers : int
+        Number of worker processes used to process the training structures.
+    text : bool
+        Also write the tab-separated `.txt` profiles next to `profiles.npz`.
+
+    Returns
+    -------
+    None
+    """
+
+    train_files = _structure_files(train_dir)
+    configs = list(product(max_distances, bin_widths, position_skips))
+
+    sums = None
+    for counts in report_progress(_map_structures(partial(sweep_counts, configs=configs), train_files, workers),
+                                  len(train_files)):
+        if sums is None:
+            sums = [(ref.astype(float), pair.astype(float)) for ref, pair in counts]
+            continue
+        for (sum_ref, sum_pair), (ref, pair) in zip(sums, counts):
+            sum_ref += ref
+            sum_pair += pair
+
+    for (max_distance, bin_width, position_skip), (sum_ref, sum_pair) in zip(configs, sums):
+        output_dir = os.path.join(profile_dir, sweep_directory(max_distance, bin_width, position_skip))
+        parameters = {"max_distance": max_distance, "bin_width": bin_width,
+                      "position_skip": position_skip, "maximum_score": model.maximum_score,
+                      "kde_bandwidth": model.kde_bandwidth}
+        write_profiles(output_dir, profile_scores(sum_ref, sum_pair, bin_width), parameters, text)
+        print(f"Profiles saved to {output_dir}")
 
 
 if __name__ == "__main__":
@@ -123,7 +717,8 @@ if __name__ == "__main__":
     parser.add_argument(
         "--trainset",
         default="data/structures/train",
-        help="Folder containing training PDB/CIF structures (default: data/structures/train)"
+        help="Folder containing training PDB/CIF structures, or text file listing them one per line "
+             "(default: data/structures/train)"
     )
 
     parser.add_argument(
@@ -143,7 +738,67 @@ if __name__ == "__main__":
 
     parser.add_argument("--bin-width", type=float, default=1.0,
                         help="Histogram bin width for distance distributions (default: 1.0 Å)")
+    parser.add_argument("--kde-bandwidth", type=float, default=None,
+                        help="Smooth the distance distributions with a Gaussian KDE of this bandwidth in Å "
+                             "(default: plain histograms)")
+
+    parser.add_argument("--neighbor-search", choices=model.neighbor_search_methods, default=None,
+                        help="Contact search backend: brute-force, cell-list grid or KD-tree (default: brute)")
+
+    parser.add_argument("--parser", choices=rna_extractor.parser_backends, default=None,
+                        help="Structure parser: streaming fast path, Biopython, or both compared (default: fast)")
+
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes used for training (default: 1)")
+
+    parser.add_argument("--block-size", type=int, default=None,
+                        help="Maximum number of pair distances held in memory at once per structure "
+                             "(default: 1048576)")
+
+    parser.add_argument("--no-text", action="store_true",
+                        help="Only write the binary profiles.npz, not the per-pair .txt files")
+
+    parser.add_argument("--channels", nargs="+", default=None, metavar="ATOM",
+                        help="Atom channels trained together from a single parse, e.g. \"C3'\" P \"C4'\" N1/N9 "
+                             "(pyrimidine/purine atom); profiles of channels other than C3' are written "
+                             "to <output>/channels/ (default: C3' only)")
+
+    parser.add_argument("--update", action="store_true",
+                        help="Update existing profiles: only parse new or changed training files")
+
+    parser.add_argument("--sweep-max-distance", type=float, nargs="+", default=None,
+                        help="Sweep mode: distance cutoffs to train in a single pass")
+
+    parser.add_argument("--sweep-bin-width", type=float, nargs="+", default=None,
+                        help="Sweep mode: histogram bin widths to train in a single pass")
+
+    parser.add_argument("--sweep-position-skip", type=int, nargs="+", default=None,
+                        help="Sweep mode: minimum residue separations to train in a single pass")
+
+    parser.add_argument("--resample", choices=resampling_methods, default=None,
+                        help="Resampling mode: bootstrap or k-fold profiles from the per-file counts "
+                             "saved in the output folder (computed first if missing)")
 
+    parser.add_argument("--replicates", type=int, default=100,
+                        help="Resampling mode: number of bootstrap replicates (default: 100)")
+
+    parser.add_argument("--folds", type=int, default=5,
+                        help="Resampling mode: number of cross-validation folds (default: 5)")
+
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Resampling mode: random seed (default: 0)")
+
+    parser.add_argument("--cache-dir", default=None,
+                        help="Folder of the parsed-structure cache (default: data/cache of the repository)")
+
+    parser.add_argument("--cache-size", type=int, default=None,
+                        help="Maximum size of the parsed-structure cache in MB (default: 1024)")
+
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Bypass the parsed-structure cache")
+
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="Empty the parsed-structure cache before running")
 
     args = parser.parse_args()
 
@@ -161,6 +816,29 @@ if __name__ == "__main__":
     if args.bin_width is not None:
         model.bin_width = args.bin_width
         model.num_bins = ceil(model.max_distance / model.bin_width)
+    if args.kde_bandwidth is not None:
+        model.kde_bandwidth = args.kde_bandwidth
+
+    if args.block_size is not None:
+        model.block_size = args.block_size
+
+    if args.neighbor_search is not None:
+        model.neighbor_search = args.neighbor_search
+
+    if args.parser is not None:
+        rna_extractor.parser_backend = args.parser
+
+    if args.cache_dir is not None:
+        structure_cache.cache_dir = args.cache_dir
+
+    if args.cache_size is not None:
+        structure_cache.max_size = args.cache_size * (1 << 20)
+
+    if args.no_cache:
+        structure_cache.enabled = False
+
+    if args.clear_cache:
+        structure_cache.clear()
 
     print("Training parameters in use:")
     print("  trainset_dir   =", args.trainset)
@@ -170,5 +848,20 @@ if __name__ == "__main__":
     print("  maximum_score  =", model.maximum_score)
     print("  bin_width      =", model.bin_width)                     
     print("  num_bins       =", model.num_bins)                      
-
-    run_train(args.trainset, args.output)
+    print("  kde_bandwidth  =", model.kde_bandwidth)
+    print("  neighbor_search=", model.neighbor_search)
+    print("  parser         =", rna_extractor.parser_backend)
+    print("  workers        =", args.workers)
+    print("  cache_dir      =", structure_cache.cache_dir if structure_cache.enabled else None)
+
+    if args.resample is not None:
+        run_resample(args.trainset, args.output, args.resample, args.replicates, args.folds,
+                     args.seed, args.workers, not args.no_text)
+    elif args.sweep_max_distance or args.sweep_bin_width or args.sweep_position_skip:
+        run_sweep(args.trainset, args.output,
+                  args.sweep_max_distance or [model.max_distance],
+                  args.sweep_bin_width or [model.bin_width],
+                  args.sweep_position_skip or [model.position_skip],
+                  args.workers, not args.no_text)
+    else:
+        run_train(args.trainset, args.output, args.workers, not args.no_text, args.update, args.channels)
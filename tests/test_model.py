@@ -0,0 +1,45 @@
+import os
+import sys
+import glob
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import utils.model as model
+import utils.rna_extractor as rna_extractor
+import utils.structure_cache as structure_cache
+
+TEST_FILES = sorted(glob.glob(os.path.join(ROOT, "data", "structures", "test", "*")))[:3]
+
+
+@pytest.fixture(scope="module")
+def structures():
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(structure_cache, "enabled", False)
+        return [rna_extractor.extract_c3_arrays(f) for f in TEST_FILES]
+
+
+@pytest.mark.parametrize("position_skip", [0, 1, 4])
+@pytest.mark.parametrize("method", ["grid", "kdtree"])
+def test_backends_match_brute(structures, monkeypatch, method, position_skip):
+    monkeypatch.setattr(model, "position_skip", position_skip)
+    # Small blocks so that the blocked backends cross block boundaries
+    monkeypatch.setattr(model, "block_size", 1 << 12)
+
+    for chains, residues, coords in structures:
+        monkeypatch.setattr(model, "neighbor_search", "brute")
+        expected = model.residue_contacts(chains, residues, coords)
+        monkeypatch.setattr(model, "neighbor_search", method)
+        contacts = model.residue_contacts(chains, residues, coords)
+
+        for a, b in zip(contacts, expected):
+            np.testing.assert_array_equal(a, b)
+        i, j = expected[:2]
+        assert np.all(j - i >= position_skip)
+        assert np.any(i == j) == (position_skip == 0)
+
+        # Every contact is one of the candidate pairs
+        candidates = set(zip(*model.candidate_pairs(chains)))
+        assert set(zip(i.tolist(), j.tolist())) <= candidates
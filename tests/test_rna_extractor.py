@@ -0,0 +1,30 @@
+import os
+import sys
+import warnings
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import utils.rna_extractor as rna_extractor
+
+
+def c3_atom(serial, resname, number, x):
+    return (f"ATOM  {serial:5d}  C3' {resname:>3} A{number:4d}    "
+            f"{x:8.3f}{0.0:8.3f}{0.0:8.3f}  1.00  0.00           C\n")
+
+
+@pytest.mark.parametrize("backend", rna_extractor.parser_backends)
+def test_models_with_different_atoms_raise_without_fallback(tmp_path, monkeypatch, backend):
+    monkeypatch.setattr(rna_extractor, "parser_backend", backend)
+    struct_file = tmp_path / "ensemble.pdb"
+    struct_file.write_text(
+        "MODEL        1\n" + c3_atom(1, "G", 1, 0.0) + c3_atom(2, "C", 2, 5.0) + "ENDMDL\n"
+        "MODEL        2\n" + c3_atom(1, "G", 1, 0.5) + "ENDMDL\nEND\n"
+    )
+
+    with warnings.catch_warnings():
+        # A fallback to Biopython would warn before raising the same error
+        warnings.simplefilter("error")
+        with pytest.raises(ValueError, match="Model 2 .* does not share"):
+            rna_extractor.extract_c3_models(str(struct_file))
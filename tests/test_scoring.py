@@ -0,0 +1,50 @@
+import os
+import sys
+import csv
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import utils.structure_cache as structure_cache
+import src.scoring as scoring
+
+MODEL_DIR = os.path.join(ROOT, "data", "profiles")
+TEST_DIR = os.path.join(ROOT, "data", "structures", "test")
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(structure_cache, "enabled", False)
+
+
+def read_scores(output_file):
+    with open(output_file, newline="") as csvfile:
+        return [(row["struct_file"], float(row["score"])) for row in csv.DictReader(csvfile)]
+
+
+def test_stream_resume_rescores_half_written_row(tmp_path):
+    output_file = str(tmp_path / "scores.csv")
+    scoring.run_score_stream(MODEL_DIR, TEST_DIR, output_file)
+    complete = dict(read_scores(output_file))
+
+    # Simulate a crash in the middle of the last row, after the name and part of the score
+    with open(output_file, "rb") as f:
+        data = f.read()
+    last_row = data.rstrip(b"\r\n").rsplit(b"\n", 1)[1]
+    cut = data[:len(data.rstrip(b"\r\n")) - len(last_row)] + last_row[:last_row.index(b",") + 4]
+    with open(output_file, "wb") as f:
+        f.write(cut)
+    last_name = last_row.split(b",")[0].decode()
+
+    assert scoring.run_score_stream(MODEL_DIR, TEST_DIR, output_file, resume=True) == 1
+
+    rows = read_scores(output_file)
+    assert sorted(name for name, _ in rows) == sorted(complete)
+    assert dict(rows)[last_name] == pytest.approx(complete[last_name], abs=1e-12)
+
+
+def test_scored_names_ignores_rows_without_score(tmp_path):
+    output_file = tmp_path / "scores.csv"
+    output_file.write_text("struct_file,score\na.pdb,1.5\nb.pdb,\nc.pdb,-2.0\nd.pdb,1.2.3\n")
+    assert scoring.scored_names(str(output_file)) == {"a.pdb", "c.pdb"}
@@ -0,0 +1,150 @@
+import os
+import sys
+import glob
+import asyncio
+import threading
+import contextlib
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import utils.model as model
+import utils.profiles as profiles
+import utils.rna_extractor as rna_extractor
+import utils.structure_cache as structure_cache
+import src.scoring as scoring
+import src.server as server
+
+MODEL_DIR = os.path.join(ROOT, "data", "profiles")
+TEST_FILES = sorted(glob.glob(os.path.join(ROOT, "data", "structures", "test", "*")))
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(structure_cache, "enabled", False)
+
+
+@pytest.fixture(scope="module")
+def reference():
+    """Profiles and the `score_file` score of every test structure."""
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(structure_cache, "enabled", False)
+        centers, table, _ = profiles.load_profiles(MODEL_DIR)
+        return centers, table, [scoring.score_file(f, centers, table) for f in TEST_FILES]
+
+
+@contextlib.contextmanager
+def running_server(socket_path=None, workers=0):
+    """Run a `ScoringServer` in-process on an event loop thread and yield its address."""
+
+    loop = asyncio.new_event_loop()
+    scoring_server = server.ScoringServer(MODEL_DIR, workers)
+    bound = loop.run_until_complete(scoring_server.start(socket_path, port=0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        yield bound
+    finally:
+        asyncio.run_coroutine_threadsafe(scoring_server.close(), loop).result(timeout=30)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=10)
+        loop.close()
+
+
+@pytest.fixture(params=["unix", "tcp"])
+def address(request, tmp_path):
+    socket_path = str(tmp_path / "rna.sock") if request.param == "unix" else None
+    with running_server(socket_path) as bound:
+        yield bound
+
+
+def test_paths_match_score_file(address, reference):
+    _, _, expected = reference
+    with server.ScoringClient(address) as client:
+        assert client.request({"op": "ping", "id": 3}) == {"ok": True, "id": 3}
+        assert client.score_files(TEST_FILES) == pytest.approx(expected, abs=1e-9)
+
+
+def test_coords_match_score_file(address, reference):
+    centers, table, _ = reference
+    struct_file = TEST_FILES[0]
+    chains, residues, coords = rna_extractor.extract_c3_arrays(struct_file)
+    sequence = "".join(model.nucleotides[r] for r in residues)
+    chain_ids = [f"chain{c}" for c in chains]
+
+    with server.ScoringClient(address) as client:
+        score = client.score_coords(coords, sequence, chains=chain_ids)
+        # Plain JSON coordinates instead of the base64 payload
+        response = client.request({"op": "coords", "coords": coords.tolist(), "residues": sequence,
+                                   "chains": chain_ids})
+
+    expected = scoring.score_file(struct_file, centers, table)
+    assert score == pytest.approx(expected, abs=1e-9)
+    assert response["score"] == pytest.approx(expected, abs=1e-9)
+
+
+def test_worker_pool_matches_score_file(reference):
+    centers, table, expected = reference
+    chains, residues, coords = rna_extractor.extract_c3_arrays(TEST_FILES[0])
+    sequence = "".join(model.nucleotides[r] for r in residues)
+
+    with running_server(workers=2) as bound, server.ScoringClient(bound) as client:
+        assert client.score_files(TEST_FILES) == pytest.approx(expected, abs=1e-9)
+        assert client.score_coords(coords, sequence) == pytest.approx(expected[0], abs=1e-9)
+        with pytest.raises(RuntimeError):
+            client.score_files([TEST_FILES[0], os.path.join(ROOT, "missing.pdb")])
+
+
+def test_existing_file_at_socket_path_is_kept(tmp_path):
+    socket_path = tmp_path / "rna.sock"
+    socket_path.write_text("not a socket")
+
+    scoring_server = server.ScoringServer(MODEL_DIR)
+    with pytest.raises(FileExistsError):
+        asyncio.run(scoring_server.start(str(socket_path)))
+    assert socket_path.read_text() == "not a socket"
+
+
+def test_errors_keep_connection_open(address, reference):
+    _, _, expected = reference
+    chains, residues, coords = rna_extractor.extract_c3_arrays(TEST_FILES[0])
+    sequence = "".join(model.nucleotides[r] for r in residues)
+
+    with server.ScoringClient(address) as client:
+        with pytest.raises(RuntimeError, match="Unknown operation"):
+            client.request({"op": "unknown"})
+        with pytest.raises(RuntimeError, match="coordinates"):
+            client.score_coords(coords[:5], sequence)
+        with pytest.raises(RuntimeError):
+            client.score_files([os.path.join(ROOT, "missing.pdb")])
+
+        # Malformed JSON is answered too
+        client.stream.write(b"not json\n")
+        client.stream.flush()
+        assert "error" in server.json.loads(client.stream.readline())
+
+        assert client.score_files(TEST_FILES[:1]) == pytest.approx(expected[:1], abs=1e-9)
+
+
+def test_close_disconnects_clients(tmp_path):
+    loop = asyncio.new_event_loop()
+    scoring_server = server.ScoringServer(MODEL_DIR)
+    bound = loop.run_until_complete(scoring_server.start(str(tmp_path / "rna.sock")))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    client = server.ScoringClient(bound)
+    assert client.request({"op": "ping"}) == {"ok": True}
+    asyncio.run_coroutine_threadsafe(scoring_server.close(), loop).result(timeout=10)
+
+    with pytest.raises(ConnectionError):
+        client.request({"op": "ping"})
+    client.close()
+
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=10)
+    # No connection handler is left to be cancelled at shutdown
+    assert not asyncio.all_tasks(loop)
+    loop.close()
@@ -0,0 +1,74 @@
+import os
+import fnmatch
+import tarfile
+import zipfile
+
+structure_extensions = (".pdb", ".cif", ".mmcif")
+archive_extensions = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz", ".zip")
+
+def is_archive(path):
+    """Return True if `path` names a tar or zip archive."""
+
+    return path.lower().endswith(archive_extensions)
+
+def _matches(name, pattern):
+    base = os.path.basename(name)
+    return base.lower().endswith(structure_extensions) and fnmatch.fnmatch(base, pattern)
+
+def _archive_members(archive_path, name_prefix, pattern):
+    """Yield `(name, archive_path, data)` for the structures of an archive, reading it sequentially."""
+
+    if archive_path.lower().endswith(".zip"):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and _matches(info.filename, pattern):
+                    yield os.path.join(name_prefix, info.filename), archive_path, archive.read(info)
+        return
+
+    # Stream mode ("r|*") never seeks, so huge (compressed) tarballs are read in one pass
+    with tarfile.open(archive_path, "r|*") as archive:
+        for member in archive:
+            if member.isfile() and _matches(member.name, pattern):
+                yield os.path.join(name_prefix, member.name), archive_path, archive.extractfile(member).read()
+
+def iter_structures(source, pattern="*", recursive=False):
+    """
+    Lazily walk a decoy source and yield its structures one at a time.
+
+    Parameters
+    ----------
+    source : str
+        A folder of PDB/CIF files (and archives), or a single tar/zip archive.
+    pattern : str
+        Shell-style pattern the file names must match, in addition to a PDB/CIF extension.
+    recursive : bool
+        Also walk subfolders.
+
+    Yields
+    ------
+    tuple
+        `(name, path, data)`: `name` is the path relative to `source` (archive members are
+        named `<archive>/<member>`), `path` the file or archive on disk, and `data` the raw
+        bytes of an archive member or None for plain files.
+    """
+
+    if os.path.isfile(source):
+        if not is_archive(source):
+            raise ValueError(f"{source} is neither a folder nor a tar/zip archive")
+        yield from _archive_members(source, os.path.basename(source), pattern)
+        return
+
+    if not os.path.isdir(source):
+        raise FileNotFoundError(f"Test dataset folder {source} not found")
+
+    for root, dirs, files in os.walk(source):
+        dirs.sort()
+        if not recursive:
+            dirs.clear()
+        for f in sorted(files):
+            path = os.path.join(root, f)
+            name = os.path.relpath(path, source)
+            if is_archive(f):
+                yield from _archive_members(path, name, pattern)
+            elif _matches(f, pattern):
+                yield name, path, None
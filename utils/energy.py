@@ -0,0 +1,161 @@
+# Scoring of single structures against stacked profiles, kept free of the multiprocessing and
+# archive imports of `src.scoring` so that `src.quick_score` starts quickly; `src.scoring`
+# re-exports these functions
+
+import numpy as np
+
+import utils.rna_extractor as rna_extractor
+import utils.model as model
+import utils.interpolation as interpolation
+import utils.instrumentation as instrumentation
+
+def contact_scores(pair_codes, distances, centers, table, lookup=None):
+    """
+    Score every residue contact in a single vectorized pass.
+
+    Parameters
+    ----------
+    pair_codes : np.ndarray
+        Pair code of every contact (row index into `table`).
+    distances : np.ndarray
+        Distance of every contact.
+    centers : np.ndarray
+        Bin centers shared by all profiles.
+    table : np.ndarray
+        Stacked profile scores, as returned by `profiles.stack_profiles`.
+    lookup : tuple, optional
+        `(scale, lut, max_error)` dense lookup table from `interpolation.lookup_table`; when
+        given, each contact is scored by a single gather instead of an interpolation.
+
+    Returns
+    -------
+    np.ndarray
+        Interpolated score of every contact.
+    """
+
+    if lookup is not None:
+        scale, lut, _ = lookup
+        return interpolation.table_lookup(scale, lut, pair_codes, distances)
+    return interpolation.table_interpolation(centers, table, pair_codes, distances)
+
+def score_contacts(pair_codes, distances, centers, table, lookup=None):
+    """
+    Score a batch of residue contacts in a single vectorized pass.
+
+    Parameters are those of `contact_scores`.
+
+    Returns
+    -------
+    float
+        Sum of the interpolated scores of all contacts.
+    """
+
+    if len(distances) == 0:
+        return 0.0
+    return float(contact_scores(pair_codes, distances, centers, table, lookup).sum())
+
+def decompose_contacts(i, j, pair_codes, energies, num_residues):
+    """
+    Split contact scores into per-residue and per-pair-type energies.
+
+    Each contact gives half of its score to each of its two residues, so both
+    decompositions sum to the total score.
+
+    Parameters
+    ----------
+    i, j : np.ndarray
+        Residue indices of every contact.
+    pair_codes : np.ndarray
+        Pair code of every contact.
+    energies : np.ndarray
+        Score of every contact, as returned by `contact_scores`.
+    num_residues : int
+        Number of residues of the structure.
+
+    Returns
+    -------
+    tuple
+        `(per_residue, per_pair)` of shapes `(num_residues,)` and `(len(model.base_pairs),)`,
+        the latter ordered as `model.base_pairs`.
+    """
+
+    per_residue = 0.5 * (np.bincount(i, energies, num_residues) + np.bincount(j, energies, num_residues))
+    per_pair = np.bincount(pair_codes, energies, len(model.base_pairs))
+    return per_residue, per_pair
+
+def load_lookup(centers, table, step):
+    """
+    Build the dense lookup table of the fast scoring mode.
+
+    Every contact score then differs from the exact interpolation by at most
+    `max_error` = max|slope| * step / 2 (see `interpolation.lookup_table`), so a structure
+    with n contacts differs by at most n * max_error.
+
+    Parameters
+    ----------
+    centers : np.ndarray
+        Bin centers shared by all profiles.
+    table : np.ndarray
+        Stacked profile scores, as returned by `profiles.stack_profiles`.
+    step : float or None
+        Lookup cell width in Angstrom; None disables the fast mode.
+
+    Returns
+    -------
+    tuple or None
+        `(scale, lut, max_error)`, or None when `step` is None.
+    """
+
+    if step is None:
+        return None
+    return interpolation.lookup_table(centers, table, step, model.max_distance)
+
+def score_file(struct_file, centers, table, handle=None, lookup=None, decompose=False):
+    """
+    Score a PDB/CIF file against a stacked profile table.
+
+    Parameters
+    ----------
+    struct_file : str
+        Path to the PDB/CIF structure; only its extension is used when `handle` is given.
+    centers : np.ndarray
+        Bin centers shared by all profiles.
+    table : np.ndarray
+        Stacked profile scores, as returned by `profiles.stack_profiles`.
+    handle : file-like, optional
+        Text stream of the structure, e.g. an archive member.
+    lookup : tuple, optional
+        Dense lookup table from `load_lookup` (fast scoring mode).
+    decompose : bool
+        Also return the per-residue and per-pair-type energies (see `decompose_contacts`);
+        the structure is then parsed with its residue labels, bypassing the structure cache.
+
+    Returns
+    -------
+    float or tuple
+        Estimated Gibbs free energy of the RNA conformation or, with `decompose`,
+        `(score, chains, residues, labels, per_residue, per_pair)` where `chains` and `residues`
+        are the chain and residue codes of the C3' atoms, in structure order, and `labels` their
+        chain identifier, residue number and insertion code (see `rna_extractor.extract_c3_labels`).
+    """
+
+    instrumentation.start_file("score", struct_file)
+
+    with instrumentation.stage("parse"):
+        if decompose:
+            chains, residues, coords, labels = rna_extractor.extract_c3_labels(struct_file, handle)
+        else:
+            chains, residues, coords = rna_extractor.extract_c3_arrays(struct_file, handle)
+    with instrumentation.stage("contacts"):
+        i, j, distances, codes = model.residue_contacts(chains, residues, coords)
+    with instrumentation.stage("interpolate"):
+        energies = contact_scores(codes, distances, centers, table, lookup)
+        s = float(energies.sum()) if len(energies) else 0.0
+
+    instrumentation.count(atoms=len(coords), contacts=len(distances))
+    if not decompose:
+        return s
+
+    with instrumentation.stage("decompose"):
+        per_residue, per_pair = decompose_contacts(i, j, codes, energies, len(residues))
+    return s, chains, residues, labels, per_residue, per_pair
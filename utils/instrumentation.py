@@ -0,0 +1,112 @@
+import os
+import csv
+import json
+import time
+from contextlib import contextmanager
+
+# Per-file and per-step timing records; collection is off unless `enabled` is set
+enabled = False
+records = []
+_current = None
+
+def start_file(step, struct_file):
+    """
+    Open the timing record of one file processed by a pipeline step.
+
+    Parameters
+    ----------
+    step : str
+        Pipeline step, e.g. "train" or "score".
+    struct_file : str
+        Path to the structure being processed.
+
+    Returns
+    -------
+    None
+    """
+
+    global _current
+    if not enabled:
+        return
+    _current = {"step": step, "file": os.path.basename(struct_file)}
+    records.append(_current)
+
+@contextmanager
+def stage(name):
+    """
+    Time a stage (e.g. "parse", "contacts") of the file opened by `start_file`.
+
+    The duration is added to the `<name>_s` field of the current file record.
+    """
+
+    if not enabled or _current is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        key = f"{name}_s"
+        _current[key] = _current.get(key, 0.0) + time.perf_counter() - start
+
+def count(**counts):
+    """Attach counts (e.g. atoms=..., contacts=...) to the file opened by `start_file`."""
+
+    if enabled and _current is not None:
+        _current.update(counts)
+
+@contextmanager
+def step(name):
+    """Time a whole pipeline step and add it to `records` with no file."""
+
+    if not enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        records.append({"step": name, "file": None, "total_s": time.perf_counter() - start})
+
+def collect(func, *args):
+    """
+    Call `func(*args)` and return `(result, new_records)`, removing the records made by the call.
+
+    Used in pool workers so that their records can be merged in the parent with `records.extend`.
+    """
+
+    global _current
+    first = len(records)
+    result = func(*args)
+    new_records = records[first:]
+    del records[first:]
+    _current = None
+    return result, new_records
+
+def write_report(output_file):
+    """
+    Write the collected records as JSON or CSV, depending on the file extension.
+
+    Parameters
+    ----------
+    output_file : str
+        Path of the report; `.csv` writes one row per record, anything else JSON.
+
+    Returns
+    -------
+    None
+    """
+
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+
+    if output_file.lower().endswith(".csv"):
+        fields = []
+        for record in records:
+            fields.extend(k for k in record if k not in fields)
+        with open(output_file, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(records)
+    else:
+        with open(output_file, "w") as f:
+            json.dump({"records": records}, f, indent=1)
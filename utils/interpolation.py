@@ -1,3 +1,5 @@
+import numpy as np
+
 def linear_interpolation(x0, y0, x1, y1, x):
     """
     Perform linear interpolation between two known points (x0, y0) and (x1, y1).
@@ -16,4 +18,88 @@ def linear_interpolation(x0, y0, x1, y1, x):
     
     if x1 == x0:
         return y0
-    return y0 + (y1 - y0) * (x - x0) / (x1 - x0)
\ No newline at end of file
+    return y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+
+def table_interpolation(centers, table, rows, x):
+    """
+    Vectorized linear interpolation of many points against a stack of profiles sharing one grid.
+    Points outside the grid are clamped to the first/last value of their profile.
+
+    ---
+    Arguments:
+        centers (np.ndarray): strictly increasing grid of shape (num_bins,)
+        table (np.ndarray): profile values of shape (num_profiles, num_bins)
+        rows (np.ndarray): profile index of every point
+        x (np.ndarray): x-coordinates where we want to estimate the values
+    ---
+    Returns:
+        np.ndarray: interpolated y value of every point
+    """
+
+    n = len(centers)
+    idx = np.searchsorted(centers, x)
+    lo = np.clip(idx - 1, 0, n - 1)
+    hi = np.clip(idx, 0, n - 1)
+
+    x0 = centers[lo]
+    x1 = centers[hi]
+    y0 = table[rows, lo]
+    y1 = table[rows, hi]
+
+    span = x1 - x0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(span > 0, (x - x0) / span, 0.0)
+    return y0 + (y1 - y0) * t
+
+def lookup_table(centers, table, step, max_x=None):
+    """
+    Resample a stack of piecewise-linear profiles onto a dense uniform grid, so that a point x
+    is scored by the single gather `lut[row, int(x * scale)]` (see `table_lookup`).
+
+    Cell k covers [k * step, (k + 1) * step) and stores the exact interpolated value at its
+    midpoint, so the lookup differs from `table_interpolation` by at most
+    max|slope| * step / 2, where the slope is taken over consecutive grid points of the profiles.
+
+    ---
+    Arguments:
+        centers (np.ndarray): strictly increasing grid of shape (num_bins,)
+        table (np.ndarray): profile values of shape (num_profiles, num_bins)
+        step (float): width of a lookup cell, e.g. 0.01 Angstrom
+        max_x (float): largest x the table must cover (default: last grid point); larger x are clamped
+    ---
+    Returns:
+        tuple: (scale, lut, max_error) with scale = 1 / step, lut of shape (num_profiles, num_cells)
+               and max_error the bound above
+    """
+
+    if step <= 0:
+        raise ValueError(f"Lookup step must be positive, got {step}")
+
+    top = max(centers[-1], max_x if max_x is not None else centers[-1])
+    num_cells = int(np.ceil(top / step)) + 1
+    mids = (np.arange(num_cells) + 0.5) * step
+
+    rows = np.repeat(np.arange(len(table)), num_cells)
+    lut = table_interpolation(centers, table, rows, np.tile(mids, len(table))).reshape(len(table), num_cells)
+
+    slopes = np.abs(np.diff(table, axis=1)) / np.diff(centers) if len(centers) > 1 else np.zeros(1)
+    max_error = float(slopes.max()) * step / 2 if slopes.size else 0.0
+    return 1.0 / step, lut, max_error
+
+def table_lookup(scale, lut, rows, x):
+    """
+    Score many points against a dense table built by `lookup_table`, one gather per point.
+
+    ---
+    Arguments:
+        scale (float): inverse cell width returned by `lookup_table`
+        lut (np.ndarray): dense table of shape (num_profiles, num_cells)
+        rows (np.ndarray): profile index of every point
+        x (np.ndarray): non-negative x-coordinates
+    ---
+    Returns:
+        np.ndarray: tabulated y value of every point
+    """
+
+    idx = np.minimum((x * scale).astype(np.intp), lut.shape[1] - 1)
+    return lut[rows, idx]
@@ -1,7 +1,8 @@
 import math
+from itertools import product
 from math import ceil
 import numpy as np
-from utils.pair import set_pairs, normalize_pair
+from utils.pair import set_pairs, pair_index
 
 # Parameters
 nucleotides = ("A", "U", "G", "C")
@@ -12,6 +13,272 @@ position_skip = 4
 maximum_score = 10
 bin_width = 1.0                      
 num_bins = ceil(max_distance / bin_width)
+block_size = 1 << 20                 # max. number of pair distances held in memory at once
+neighbor_search = "brute"           # contact search backend, one of `neighbor_search_methods`
+neighbor_search_methods = ("brute", "grid", "kdtree")
+kde_bandwidth = None                # Gaussian KDE bandwidth (Angstrom) used to smooth counts, None for plain histograms
+
+# Names of the module-level parameters above, see `parameters` / `configure`
+parameter_names = ("max_distance", "max_distance_sq", "position_skip", "maximum_score",
+                   "bin_width", "num_bins", "block_size", "neighbor_search", "kde_bandwidth")
+
+# Integer encodings: residue code = position in `nucleotides`,
+# pair code = position of the normalized pair in `base_pairs`
+residue_codes = {nt: code for code, nt in enumerate(nucleotides)}
+pair_codes = pair_index(nucleotides)
+
+def parameters():
+    """
+    Snapshot the current model parameters.
+
+    Returns
+    -------
+    dict
+        Mapping of every name in `parameter_names` to its current value.
+    """
+
+    return {name: globals()[name] for name in parameter_names}
+
+def configure(**params):
+    """
+    Set model parameters, e.g. from a `parameters()` snapshot taken in another process.
+
+    Parameters
+    ----------
+    **params
+        New values for names in `parameter_names`.
+
+    Returns
+    -------
+    None
+    """
+
+    unknown = set(params) - set(parameter_names)
+    if unknown:
+        raise ValueError(f"Unknown model parameters: {sorted(unknown)}")
+    globals().update(params)
+
+def encode_residues(residues):
+    """
+    Convert residue names into integer residue codes.
+
+    Parameters
+    ----------
+    residues : iterable of str
+        Residue names, each one of `nucleotides`.
+
+    Returns
+    -------
+    np.ndarray
+        Integer code of every residue (its position in `nucleotides`).
+    """
+
+    return np.fromiter((residue_codes[r] for r in residues), dtype=np.intp)
+
+def encode_atoms(atoms):
+    """
+    Convert atom entries into parallel integer-coded arrays.
+
+    Parameters
+    ----------
+    atoms : list
+        List of atom entries `[chain_id, residue_name, x, y, z]`.
+
+    Returns
+    -------
+    tuple
+        `(chains, residues, coords)` where `chains` holds one integer code per chain
+        (numbered in order of first appearance), `residues` holds residue codes and
+        `coords` is an `(n, 3)` float array.
+    """
+
+    chain_ids = {}
+    chains = np.fromiter((chain_ids.setdefault(a[0], len(chain_ids)) for a in atoms),
+                         dtype=np.intp, count=len(atoms))
+    residues = encode_residues(a[1] for a in atoms)
+    coords = np.array([a[2:5] for a in atoms], dtype=float).reshape(-1, 3)
+
+    return chains, residues, coords
+
+def _brute_pairs(chains, coords):
+    """Candidate contacts by evaluating every i < j distance, yielded in blocks of rows."""
+
+    n = len(coords)
+    rows_per_block = max(1, block_size // max(n, 1))
+
+    for start in range(0, max(n - position_skip, 0), rows_per_block):
+        stop = min(start + rows_per_block, n - position_skip)
+        rows = np.arange(start, stop)
+        cols = np.arange(start + position_skip, n)
+
+        diff = coords[cols][None, :, :] - coords[rows][:, None, :]
+        d2 = np.sum(diff * diff, axis=2)
+
+        mask = (cols[None, :] - rows[:, None] >= position_skip)
+        mask &= chains[cols][None, :] == chains[rows][:, None]
+        mask &= d2 < max_distance_sq
+
+        r, c = np.nonzero(mask)
+        yield rows[r], cols[c], d2[r, c]
+
+def _grid_pairs(chains, coords):
+    """Candidate contacts from a uniform cell list with cells of edge `max_distance`, yielded in blocks."""
+
+    n = len(coords)
+    if n == 0:
+        return
+
+    # Cell coordinates, shifted by one so that neighbour offsets never wrap around;
+    # the edge is padded so that rounding never pushes a contact two cells apart
+    edge = max_distance * (1 + 1e-9)
+    cells = np.floor((coords - coords.min(axis=0)) / edge).astype(np.intp) + 1
+    dims = cells.max(axis=0) + 2
+    cell_ids = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+
+    order = np.argsort(cell_ids, kind="stable")
+    sorted_ids = cell_ids[order]
+
+    for dx, dy, dz in product((-1, 0, 1), repeat=3):
+        neighbor_ids = cell_ids + (dx * dims[1] + dy) * dims[2] + dz
+        lo = np.searchsorted(sorted_ids, neighbor_ids, side="left")
+        counts = np.searchsorted(sorted_ids, neighbor_ids, side="right") - lo
+
+        rows_per_block = max(1, block_size // max(int(counts.max()), 1))
+        for start in range(0, n, rows_per_block):
+            block_counts = counts[start:start + rows_per_block]
+            total = int(block_counts.sum())
+            if total == 0:
+                continue
+
+            # Expand every atom into the members of its neighbour cell
+            first = np.cumsum(block_counts) - block_counts
+            rows = np.repeat(np.arange(start, start + len(block_counts)), block_counts)
+            offsets = np.arange(total) - np.repeat(first, block_counts)
+            cols = order[np.repeat(lo[start:start + rows_per_block], block_counts) + offsets]
+
+            keep = (cols - rows >= position_skip) & (chains[cols] == chains[rows])
+            rows, cols = rows[keep], cols[keep]
+
+            diff = coords[cols] - coords[rows]
+            d2 = np.sum(diff * diff, axis=1)
+            keep = d2 < max_distance_sq
+            yield rows[keep], cols[keep], d2[keep]
+
+def _kdtree_pairs(chains, coords):
+    """Candidate contacts from Biopython's KD-tree radius search, yielded as a single block."""
+
+    from Bio.PDB.kdtrees import KDTree
+
+    if len(coords) < 2:
+        return
+
+    neighbors = KDTree(np.ascontiguousarray(coords), 10).neighbor_search(max_distance * (1 + 1e-9))
+    pairs = np.array([(nb.index1, nb.index2) for nb in neighbors], dtype=np.intp).reshape(-1, 2)
+    if position_skip <= 0:
+        # The radius search never pairs an atom with itself, the other backends do
+        diagonal = np.arange(len(coords), dtype=np.intp)
+        pairs = np.concatenate([pairs, np.stack([diagonal, diagonal], axis=1)])
+    pairs.sort(axis=1)
+    rows, cols = pairs[:, 0], pairs[:, 1]
+
+    keep = (cols - rows >= position_skip) & (chains[cols] == chains[rows])
+    rows, cols = rows[keep], cols[keep]
+
+    diff = coords[cols] - coords[rows]
+    d2 = np.sum(diff * diff, axis=1)
+    keep = d2 < max_distance_sq
+    yield rows[keep], cols[keep], d2[keep]
+
+def _pair_blocks(chains, coords):
+    """Blocks of `(i, j, d2)` contacts from the backend selected by `neighbor_search`."""
+
+    if neighbor_search == "brute":
+        return _brute_pairs(chains, coords)
+    if neighbor_search == "grid":
+        return _grid_pairs(chains, coords)
+    if neighbor_search == "kdtree":
+        return _kdtree_pairs(chains, coords)
+    raise ValueError(f"Unknown neighbor search method {neighbor_search!r}, "
+                     f"expected one of {neighbor_search_methods}")
+
+def candidate_pairs(chains):
+    """
+    List every residue pair that may form a contact, whatever the coordinates: `i < j` in the
+    same chain and at least `position_skip` positions apart.
+
+    Parameters
+    ----------
+    chains : np.ndarray
+        Integer chain code of every residue.
+
+    Returns
+    -------
+    tuple
+        `(i, j)` arrays ordered by `i` then `j`, as in `residue_contacts`.
+    """
+
+    chains = np.asarray(chains)
+    i_blocks, j_blocks = [], []
+
+    for chain in np.unique(chains):
+        idx = np.flatnonzero(chains == chain)
+        a, b = np.triu_indices(len(idx), 1 if position_skip > 0 else 0)
+        keep = idx[b] - idx[a] >= position_skip
+        i_blocks.append(idx[a[keep]])
+        j_blocks.append(idx[b[keep]])
+
+    if not i_blocks:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    i = np.concatenate(i_blocks)
+    j = np.concatenate(j_blocks)
+    order = np.lexsort((j, i))
+    return i[order], j[order]
+
+def residue_contacts(chains, residues, coords):
+    """
+    Compute all residue contacts of an RNA structure as parallel arrays.
+
+    Two residues `i < j` are in contact when they belong to the same chain, are at least
+    `position_skip` positions apart and closer than `max_distance`. Candidates are found
+    with the backend selected by `neighbor_search`: "brute" evaluates the upper triangle
+    in blocks of at most `block_size` distances, "grid" uses a cell list and "kdtree"
+    Biopython's KD-tree. All backends return the same contacts, including the `i == j`
+    self-contacts at distance 0 that a `position_skip` of 0 allows.
+
+    Parameters
+    ----------
+    chains : np.ndarray
+        Integer chain code of every residue.
+    residues : np.ndarray
+        Integer residue code of every residue.
+    coords : np.ndarray
+        `(n, 3)` array of residue coordinates.
+
+    Returns
+    -------
+    tuple
+        `(i, j, distances, pair_codes)` arrays with one entry per contact, ordered by `i` then `j`.
+    """
+
+    chains = np.asarray(chains)
+    residues = np.asarray(residues)
+    coords = np.asarray(coords, dtype=float)
+
+    blocks = list(_pair_blocks(chains, coords))
+    if not blocks:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty.copy(), np.empty(0, dtype=float), empty.copy()
+
+    i = np.concatenate([block[0] for block in blocks])
+    j = np.concatenate([block[1] for block in blocks])
+    d2 = np.concatenate([block[2] for block in blocks])
+
+    if neighbor_search != "brute":
+        order = np.lexsort((j, i))
+        i, j, d2 = i[order], j[order], d2[order]
+
+    return i, j, np.sqrt(d2), pair_codes[residues[i], residues[j]]
 
 def residue_distances(atoms):
     """
@@ -27,43 +294,112 @@ def residue_distances(atoms):
     list of tuples
         Each tuple is `(res_i, res_j, distance)` representing the distance between two residues.
     """
-    
-    atoms = np.array(atoms, dtype=object)
 
-    chains = atoms[:, 0]
-    residues = atoms[:, 1]
-    coords = atoms[:, 2:].astype(float)
+    chains, residues, coords = encode_atoms(atoms)
+    i, j, distances, _ = residue_contacts(chains, residues, coords)
 
-    n = len(atoms)
-    distances = []
+    return [(nucleotides[residues[a]], nucleotides[residues[b]], float(d))
+            for a, b, d in zip(i, j, distances)]
 
-    for i in range(n - position_skip):
-        chain_i = chains[i]
-        res_i = residues[i]
-        coord_i = coords[i]
+def contact_counts(distances, codes, bin_width=None, num_bins=None):
+    """
+    Histogram contact distances into reference and base pair-specific counts.
 
-        j_range = np.arange(i + position_skip, n)
-        same_chain = (chains[j_range] == chain_i)
-        j_valid = j_range[same_chain]
+    Parameters
+    ----------
+    distances : np.ndarray
+        Distance of every contact.
+    codes : np.ndarray
+        Pair code of every contact (position of its pair in `base_pairs`).
+    bin_width : float, optional
+        Histogram bin width (default: module `bin_width`).
+    num_bins : int, optional
+        Number of bins; longer distances fall into the last bin (default: module `num_bins`).
 
-        if j_valid.size == 0:
-            continue
+    Returns
+    -------
+    tuple
+        `(reference_counts, pair_counts)` where `reference_counts` has shape `(num_bins,)`
+        and `pair_counts` has shape `(len(base_pairs), num_bins)`, rows ordered as `base_pairs`.
+    """
 
-        coords_j = coords[j_valid]
-        diff = coords_j - coord_i
-        d2 = np.sum(diff * diff, axis=1)
+    if bin_width is None:
+        bin_width = globals()["bin_width"]
+    if num_bins is None:
+        num_bins = globals()["num_bins"]
 
-        mask = d2 < max_distance_sq
-        if not np.any(mask):
-            continue
+    bins = np.minimum((np.asarray(distances) / bin_width).astype(np.intp), num_bins - 1)
 
-        j_kept = j_valid[mask]
-        d2_kept = d2[mask]
+    pair_counts = np.bincount(np.asarray(codes) * num_bins + bins,
+                              minlength=len(base_pairs) * num_bins).reshape(len(base_pairs), num_bins)
+    reference_counts = pair_counts.sum(axis=0)
 
-        for j_idx, d2_val in zip(j_kept, d2_kept):
-            distances.append((res_i, residues[j_idx], math.sqrt(d2_val)))
+    return reference_counts, pair_counts
+
+def contact_blocks(chains, residues, coords):
+    """
+    Yield the residue contacts of a structure block by block, as found by the `neighbor_search`
+    backend, without materializing them all.
 
-    return distances
+    Parameters
+    ----------
+    chains : np.ndarray
+        Integer chain code of every residue.
+    residues : np.ndarray
+        Integer residue code of every residue.
+    coords : np.ndarray
+        `(n, 3)` array of residue coordinates.
+
+    Yields
+    ------
+    tuple
+        `(distances, pair_codes)` arrays of the contacts of one block, at most `block_size`
+        of them except for "kdtree", which finds all contacts in a single block.
+    """
+
+    chains = np.asarray(chains)
+    residues = np.asarray(residues)
+    coords = np.asarray(coords, dtype=float)
+
+    for i, j, d2 in _pair_blocks(chains, coords):
+        yield np.sqrt(d2), pair_codes[residues[i], residues[j]]
+
+def contact_histograms(chains, residues, coords, bin_width=None, num_bins=None):
+    """
+    Histogram the residue contacts of a structure block by block, without materializing them.
+
+    Each block of contacts from `contact_blocks` is binned with
+    `contact_counts` and dropped, so peak memory is bounded by `block_size` distances
+    whatever the size of the structure ("kdtree" returns its contacts as a single block).
+    The counts are identical to `contact_counts(*residue_contacts(...)[2:])`.
+
+    Parameters
+    ----------
+    chains : np.ndarray
+        Integer chain code of every residue.
+    residues : np.ndarray
+        Integer residue code of every residue.
+    coords : np.ndarray
+        `(n, 3)` array of residue coordinates.
+    bin_width : float, optional
+        Histogram bin width (default: module `bin_width`).
+    num_bins : int, optional
+        Number of bins (default: module `num_bins`).
+
+    Returns
+    -------
+    tuple
+        `(reference_counts, pair_counts)` as returned by `contact_counts`.
+    """
+
+    reference_counts, pair_counts = contact_counts(np.empty(0), np.empty(0, dtype=np.intp),
+                                                   bin_width, num_bins)
+    for distances, codes in contact_blocks(chains, residues, coords):
+        block_reference, block_pairs = contact_counts(distances, codes, bin_width, num_bins)
+        reference_counts += block_reference
+        pair_counts += block_pairs
+
+    return reference_counts, pair_counts
 
 def distance_counts(atoms):
     """
@@ -76,29 +412,65 @@ def distance_counts(atoms):
 
     Returns
     -------
-    tuple`(reference_counts, pair_counts)` where `reference_counts` is a list of counts for all residues,
-    and `pair_counts` is a dictionary of counts per base pair.
+    tuple`(reference_counts, pair_counts)` where `reference_counts` is an array of counts for all residues,
+    and `pair_counts` is a `(len(base_pairs), num_bins)` array of counts per base pair.
     """
 
-    pair_counts = {bp: [0] * num_bins for bp in base_pairs}
-    reference_counts = [0] * num_bins
-
-    for res_i, res_j, distance in residue_distances(atoms):
-
-        bin_index = int(distance / bin_width)
+    _, _, distances, codes = residue_contacts(*encode_atoms(atoms))
+    return contact_counts(distances, codes)
 
-        # if bin_index >= num_bins:
-        #     continue
+def smooth_counts(counts, bandwidth=None, bin_width=None):
+    """
+    Turn distance histograms into binned Gaussian kernel density estimates on the same grid.
 
-        if bin_index >= num_bins:
-            bin_index = num_bins - 1
+    The counts are convolved with a Gaussian kernel of standard deviation `bandwidth`
+    sampled on the bin grid, using an FFT, so the cost depends on the number of bins only
+    (the contacts themselves were already binned). Kernel mass falling below 0 Angstrom is
+    reflected back; the total count is otherwise preserved, up to what leaks past the last bin.
 
-        base_pair = normalize_pair(res_i, res_j)
+    Parameters
+    ----------
+    counts : np.ndarray
+        Counts per distance bin, along the last axis (several histograms may be stacked).
+    bandwidth : float, optional
+        Kernel bandwidth in Angstrom (default: `kde_bandwidth`); None or 0 returns the counts unchanged.
+    bin_width : float, optional
+        Width of the bins (default: `bin_width`).
 
-        reference_counts[bin_index] += 1
-        pair_counts[base_pair][bin_index] += 1
+    Returns
+    -------
+    np.ndarray
+        Smoothed counts, same shape as `counts`.
+    """
 
-    return reference_counts, pair_counts
+    counts = np.asarray(counts, dtype=float)
+    bandwidth = kde_bandwidth if bandwidth is None else bandwidth
+    if not bandwidth:
+        return counts
+    if bandwidth < 0:
+        raise ValueError(f"KDE bandwidth must be positive, got {bandwidth}")
+
+    bin_width = globals()["bin_width"] if bin_width is None else bin_width
+    n = counts.shape[-1]
+    sigma = bandwidth / bin_width
+    half = min(int(ceil(4 * sigma)), 4 * n)
+
+    offsets = np.arange(-half, half + 1)
+    kernel = np.exp(-0.5 * (offsets / sigma) ** 2)
+    kernel /= kernel.sum()
+
+    # Reflect the histogram at 0 Angstrom so that no mass is lost below the first bin; a kernel
+    # wider than the grid only reaches zeros beyond the mirrored bins, keep them so that bin k
+    # stays at index k + half
+    mirrored = counts[..., :half][..., ::-1]
+    padding = np.zeros(counts.shape[:-1] + (half - mirrored.shape[-1],))
+    reflected = np.concatenate([padding, mirrored, counts], axis=-1)
+
+    size = 1 << int(math.ceil(math.log2(reflected.shape[-1] + len(kernel) - 1)))
+    full = np.fft.irfft(np.fft.rfft(reflected, size) * np.fft.rfft(kernel, size), size)
+    # Full convolution index of bin k: k + half (reflection) + half (kernel centre)
+    smoothed = full[..., 2 * half:2 * half + n]
+    return np.clip(smoothed, 0.0, None)
 
 def frequencies(counts):
     """
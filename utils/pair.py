@@ -1,4 +1,5 @@
 from itertools import combinations_with_replacement
+import numpy as np
 
 def normalize_pair(b1, b2):
     """
@@ -36,3 +37,27 @@ def set_pairs(nucleotides):
 
     nucleotides = sorted(nucleotides)
     return ["".join(pair) for pair in combinations_with_replacement(nucleotides, 2)]
+
+def pair_index(nucleotides):
+    """
+    Build a lookup matrix from two nucleotide codes to the index of their normalized pair.
+
+    Parameters
+    ----------
+    nucleotides : list
+        List of nucleotide characters; a nucleotide's code is its position in this list.
+
+    Returns
+    -------
+    np.ndarray
+        Symmetric `(len(nucleotides), len(nucleotides))` integer matrix whose entry `[a, b]`
+        is the position of `normalize_pair(nucleotides[a], nucleotides[b])` in `set_pairs(nucleotides)`.
+    """
+
+    pairs = set_pairs(nucleotides)
+    n = len(nucleotides)
+    index = np.empty((n, n), dtype=np.intp)
+    for a in range(n):
+        for b in range(n):
+            index[a, b] = pairs.index(normalize_pair(nucleotides[a], nucleotides[b]))
+    return index
@@ -0,0 +1,238 @@
+import os
+import numpy as np
+
+import utils.model as model
+
+# Single-file binary profile artifact written next to the `<pair>.txt` files
+profile_file = "profiles.npz"
+
+# Training parameters that define which contacts a profile scores, applied to `model` by
+# `load_profiles(..., configure=True)`
+contact_parameters = ("max_distance", "position_skip")
+
+# Profiles of atom channels other than C3' live in `<profile_dir>/channels/<channel folder>`
+default_channel = "C3'"
+channels_dir = "channels"
+
+def stack_profiles(reference_distributions):
+    """
+    Stack per-pair reference profiles into a single score table sharing one distance grid.
+
+    Parameters
+    ----------
+    reference_distributions : dict
+        Dictionary mapping normalized residue pairs to `(num_bins, 2)` arrays of
+        bin centers and scores.
+
+    Returns
+    -------
+    tuple
+        `(centers, table)` where `centers` has shape `(num_bins,)` and `table` has shape
+        `(len(model.base_pairs), num_bins)`, rows ordered as `model.base_pairs`.
+    """
+
+    centers = np.asarray(reference_distributions[model.base_pairs[0]], dtype=float)[:, 0]
+    table = np.empty((len(model.base_pairs), len(centers)), dtype=float)
+
+    for code, bp in enumerate(model.base_pairs):
+        rd = np.asarray(reference_distributions[bp], dtype=float)
+        if rd.shape[0] != len(centers) or not np.array_equal(rd[:, 0], centers):
+            raise ValueError(f"Profile {bp} does not share the distance grid of {model.base_pairs[0]}")
+        table[code] = rd[:, 1]
+
+    return centers, table
+
+def save_profiles(profile_dir, centers, table, parameters, text=True):
+    """
+    Save a stacked profile table as `profiles.npz` and, optionally, as `<pair>.txt` files.
+
+    The `.npz` archive is uncompressed and holds `table` (pairs x bins), `centers`, `pairs`
+    and the training parameters.
+
+    Parameters
+    ----------
+    profile_dir : str
+        Path to the folder where the profiles are written.
+    centers : np.ndarray
+        Bin centers of the profiles.
+    table : np.ndarray
+        `(len(model.base_pairs), num_bins)` scores, rows ordered as `model.base_pairs`.
+    parameters : dict
+        Training parameters `max_distance`, `bin_width`, `position_skip`, `maximum_score` and
+        optionally `kde_bandwidth` (stored as 0 for plain histograms) and the atom `channel`.
+    text : bool
+        Also write the tab-separated `<pair>.txt` files.
+
+    Returns
+    -------
+    None
+    """
+
+    os.makedirs(profile_dir, exist_ok=True)
+
+    np.savez(os.path.join(profile_dir, profile_file),
+             table=np.asarray(table, dtype=float),
+             centers=np.asarray(centers, dtype=float),
+             pairs=np.array(model.base_pairs),
+             kde_bandwidth=parameters.get("kde_bandwidth") or 0.0,
+             channel=parameters.get("channel", default_channel),
+             **{name: parameters[name] for name in ("max_distance", "bin_width",
+                                                    "position_skip", "maximum_score")})
+
+    if text:
+        export_text(profile_dir, centers, table)
+
+def export_text(profile_dir, centers, table):
+    """
+    Write a stacked profile table as one tab-separated `<pair>.txt` file (bin center, score) per base pair.
+
+    Parameters
+    ----------
+    profile_dir : str
+        Path to the folder where the profile files are written.
+    centers : np.ndarray
+        Bin centers of the profiles.
+    table : np.ndarray
+        `(len(model.base_pairs), num_bins)` scores, rows ordered as `model.base_pairs`.
+
+    Returns
+    -------
+    None
+    """
+
+    os.makedirs(profile_dir, exist_ok=True)
+
+    for code, bp in enumerate(model.base_pairs):
+        output_file = os.path.join(profile_dir, f"{bp}.txt")
+        with open(output_file, "w") as f:
+            for dist, value in zip(centers, table[code]):
+                f.write(f"{dist:.6f}\t{value}\n")
+
+def apply_parameters(parameters):
+    """
+    Configure `model` with the contact definition (`contact_parameters`) the profiles were
+    trained with, so that scoring counts the same contacts.
+
+    Parameters
+    ----------
+    parameters : dict
+        Training parameters returned by `load_profiles`; those missing (text profiles) keep
+        the current `model` values.
+
+    Returns
+    -------
+    None
+    """
+
+    values = {name: parameters[name] for name in contact_parameters if name in parameters}
+    if "max_distance" in values:
+        values["max_distance_sq"] = values["max_distance"] ** 2
+    model.configure(**values)
+
+def load_profiles(profile_dir, configure=False):
+    """
+    Load the profiles of a folder in one call, from `profiles.npz` if present,
+    otherwise from the `<pair>.txt` files.
+
+    Parameters
+    ----------
+    profile_dir : str
+        Path to the folder containing the profiles.
+    configure : bool
+        Also apply the stored contact definition to `model` (see `apply_parameters`), as
+        scoring must.
+
+    Returns
+    -------
+    tuple
+        `(centers, table, parameters)`; `parameters` holds the training parameters
+        stored in `profiles.npz` (and its atom `channel`), and is empty for text profiles.
+    """
+
+    if not os.path.isdir(profile_dir):
+        raise FileNotFoundError(f"Model folder {profile_dir} not found")
+
+    binary = os.path.join(profile_dir, profile_file)
+    if os.path.exists(binary):
+        with np.load(binary) as data:
+            if list(data["pairs"]) != list(model.base_pairs):
+                raise ValueError(f"{binary} does not list the base pairs in the order of model.base_pairs")
+            parameters = {name: data[name].item() for name in ("max_distance", "bin_width",
+                                                                "position_skip", "maximum_score",
+                                                                "kde_bandwidth", "channel") if name in data}
+            centers, table = data["centers"], data["table"]
+        if configure:
+            apply_parameters(parameters)
+        return centers, table, parameters
+
+    reference_distributions = {}
+    for bp in model.base_pairs:
+        filename = os.path.join(profile_dir, f"{bp}.txt")
+        reference_distributions[bp] = np.loadtxt(filename)
+
+    centers, table = stack_profiles(reference_distributions)
+    return centers, table, {}
+
+def channel_dir(profile_dir, channel):
+    """
+    Folder of the profiles of an atom channel: `profile_dir` itself for C3', otherwise a
+    subfolder of `<profile_dir>/channels` named after the channel ("C4'" -> "C4p", "N1/N9" -> "N1-N9").
+    """
+
+    if channel == default_channel:
+        return profile_dir
+    return os.path.join(profile_dir, channels_dir, channel.replace("'", "p").replace("/", "-"))
+
+def load_channels(profile_dir, channels=None, configure=False):
+    """
+    Load the profiles of several atom channels.
+
+    Parameters
+    ----------
+    profile_dir : str
+        Path to the folder containing the profiles.
+    channels : sequence of str, optional
+        Channels to load (default: every channel found, C3' first if present).
+    configure : bool
+        Also apply the stored contact definition to `model` (see `apply_parameters`); all
+        channels must then share it.
+
+    Returns
+    -------
+    list of tuple
+        `(channel, centers, table)` for every channel.
+    """
+
+    if channels is None:
+        channels = []
+        if os.path.exists(os.path.join(profile_dir, profile_file)) or \
+                os.path.exists(os.path.join(profile_dir, f"{model.base_pairs[0]}.txt")):
+            channels.append(default_channel)
+        root = os.path.join(profile_dir, channels_dir)
+        found = []
+        for entry in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+            binary = os.path.join(root, entry, profile_file)
+            if os.path.exists(binary):
+                with np.load(binary) as data:
+                    found.append(data["channel"].item())
+        channels += found
+        if not channels:
+            raise FileNotFoundError(f"No profiles found in {profile_dir}")
+
+    loaded = []
+    contacts = None
+    for channel in channels:
+        centers, table, parameters = load_profiles(channel_dir(profile_dir, channel))
+        if parameters.get("channel", default_channel) != channel:
+            raise ValueError(f"Profiles of {channel_dir(profile_dir, channel)} are those of the "
+                             f"{parameters['channel']} channel, not {channel}")
+        channel_contacts = {name: parameters[name] for name in contact_parameters if name in parameters}
+        if contacts is not None and channel_contacts != contacts:
+            raise ValueError(f"Channels of {profile_dir} were trained with different contact "
+                             f"definitions: {contacts} and {channel_contacts}")
+        contacts = channel_contacts
+        loaded.append((channel, centers, table))
+
+    if configure:
+        apply_parameters(contacts)
+    return loaded
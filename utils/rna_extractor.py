@@ -1,45 +1,699 @@
-from Bio.PDB import PDBParser, MMCIFParser
+import io
 import os
+import re
+import warnings
+from itertools import chain as chain_iter
+import numpy as np
 
-def extract_c3_atoms(struct_path):
+import utils.model as model
+import utils.structure_cache as structure_cache
+
+# Parser used by `extract_c3_arrays`: the streaming "fast" parser (falling back to
+# Biopython on malformed input), "biopython" only, or "validate" (both, compared)
+parser_backend = "fast"
+parser_backends = ("fast", "biopython", "validate")
+
+c3_atom = "C3'"
+valid_res = {"A", "U", "G", "C"}
+purines = ("A", "G")
+pyrimidines = ("C", "U")
+
+def channel_atoms(channel):
+    """
+    Atom name read for every nucleotide by an atom channel.
+
+    Parameters
+    ----------
+    channel : str
+        Atom name shared by all nucleotides (e.g. "C3'", "P", "C4'"), or "<pyrimidine
+        atom>/<purine atom>" for base atoms named differently in both families (e.g. "N1/N9",
+        the glycosidic nitrogens).
+
+    Returns
+    -------
+    dict
+        Mapping of every nucleotide of `valid_res` to its atom name.
+    """
+
+    names = channel.split("/")
+    if len(names) == 1 and names[0]:
+        return {resname: names[0] for resname in valid_res}
+    if len(names) == 2 and all(names):
+        return {**{resname: names[0] for resname in pyrimidines},
+                **{resname: names[1] for resname in purines}}
+    raise ValueError(f"Invalid atom channel {channel!r}, expected an atom name or '<pyrimidine>/<purine>'")
+
+def _biopython_parser(struct_path):
+    """Biopython parser for the format given by the file extension, imported on first use."""
+
+    # Bio.PDB is slow to import and not needed by the streaming parser
+    from Bio.PDB import PDBParser, MMCIFParser
+
+    ext = os.path.splitext(struct_path)[1].lower()
+    if ext in [".cif", ".mmcif"]:
+        return MMCIFParser(QUIET=True)
+    return PDBParser(QUIET=True)
+
+def _records(struct_path):
+    """Streaming record reader (`_pdb_records` or `_mmcif_records`) for the file extension."""
+
+    ext = os.path.splitext(struct_path)[1].lower()
+    return _mmcif_records if ext in [".cif", ".mmcif"] else _pdb_records
+
+def _backend():
+    """The configured `parser_backend`, checked against `parser_backends`."""
+
+    if parser_backend not in parser_backends:
+        raise ValueError(f"Unknown parser backend {parser_backend!r}, expected one of {parser_backends}")
+    return parser_backend
+
+def _same(result, reference):
+    """Whether two parse results (arrays, possibly nested in tuples/lists) are identical."""
+
+    if isinstance(result, np.ndarray):
+        return np.array_equal(result, reference)
+    return len(result) == len(reference) and all(_same(a, b) for a, b in zip(result, reference))
+
+def _dispatch(struct_path, fast_fn, bio_fn):
+    """
+    Parse a structure file with `parser_backend`.
+
+    Parameters
+    ----------
+    struct_path : str
+        Path of the parsed file, used in messages.
+    fast_fn, bio_fn : callable
+        Parse with the streaming parser or with Biopython, without arguments.
+
+    Returns
+    -------
+    object
+        The result of `bio_fn` for "biopython"; that of `fast_fn` for "fast", falling back to
+        `bio_fn` when the streaming parser fails on malformed input; that of `fast_fn` for
+        "validate", after checking that `bio_fn` gives the same arrays.
+    """
+
+    backend = _backend()
+    if backend == "biopython":
+        return bio_fn()
+
+    if backend == "fast":
+        try:
+            return fast_fn()
+        except (ValueError, IndexError) as err:
+            warnings.warn(f"Fast parser failed on {struct_path} ({err}), falling back to Biopython")
+            return bio_fn()
+
+    result, reference = fast_fn(), bio_fn()
+    if not _same(result, reference):
+        raise ValueError(f"Fast parser and Biopython disagree on {struct_path}")
+    return result
+
+def extract_c3_atoms(struct_path, handle=None):
     """
     Parse a PDB/CIF file using Biopython's PDBParser/MMCIFParser and extract all C3' atoms
     belonging to standard RNA residues (A, U, G, C) from the first model.
 
     Arguments:
+        struct_path (str): path to the structure; only its extension is used when `handle` is given
+        handle (file-like, optional): text stream to parse instead of opening `struct_path`
 
     Returns:
         list of lists: [chain_id, residue_name, x, y, z]
     """
     
     # Automatically choose parser based on file extension 
-    ext = os.path.splitext(struct_path)[1].lower()
-
-    if ext in [".cif", ".mmcif"]:
-        parser = MMCIFParser(QUIET=True)
-    else:
-        parser = PDBParser(QUIET=True)
+    parser = _biopython_parser(struct_path)
 
-    structure = parser.get_structure("structure", struct_path)
+    structure = parser.get_structure("structure", struct_path if handle is None else handle)
 
     # Use only the first model
-    model = next(structure.get_models())
+    return _model_atoms(next(structure.get_models()))
+
+def _model_atoms(model, channel=c3_atom, labels=None):
+    """
+    Atoms of one channel (C3' by default) of standard RNA residues of one Biopython model, as
+    [chain_id, residue_name, x, y, z]; the `(chain_id, residue_number, insertion_code)` of
+    every atom is appended to `labels` when given.
+    """
 
     atoms = []
-    valid_res = {"A", "U", "G", "C"}
+    atom_names = channel_atoms(channel)
+    selected = set(atom_names.values())
 
     for atom in model.get_atoms():
-        if atom.get_name() != "C3'":
+        if atom.get_name() not in selected:
             continue
 
         residue = atom.get_parent()
         resname = residue.get_resname().strip()
 
-        if resname not in valid_res:
+        if resname not in valid_res or atom_names[resname] != atom.get_name():
             continue
 
         chain = residue.get_parent()
         x, y, z = atom.coord
         atoms.append([chain.id, resname, float(x), float(y), float(z)])
+        if labels is not None:
+            _, number, icode = residue.get_id()
+            labels.append((chain.id, str(number), icode.strip()))
 
     return atoms
+
+def _collect(records, atom_indices=False, channels=None, labels=False):
+    """
+    Order streamed atom records the way Biopython walks a model and encode them as arrays.
+
+    `records` yields `(atom_name, chain_id, residue_id, resname, altloc, occupancy, x, y, z)`,
+    with `residue_id` set to None for atoms that are not read (which only register their
+    chain); residues are grouped by chain (in order of first appearance) and only the selected
+    alternate location of each atom is kept (highest occupancy, first one on ties). Both parsers
+    yield one record per atom, so with `atom_indices` the position of every kept atom among
+    all atoms of the model is returned as a fourth array.
+
+    Without `channels`, the C3' atoms are returned as `(chains, residues, coords)`; otherwise
+    a list with these arrays for every channel (see `channel_atoms`). With `labels`, every
+    result ends with the `(num_atoms, 3)` string array of the chain identifier, residue number
+    and insertion code of every atom, as written in the file.
+    """
+
+    # Atom name -> [(channel index, nucleotides read from this atom or None for all)]
+    selector = {c3_atom: [(0, None)]}
+    if channels is not None:
+        selector = {}
+        for c, channel in enumerate(channels):
+            atom_names = channel_atoms(channel)
+            for name in set(atom_names.values()):
+                resnames = {r for r, n in atom_names.items() if n == name}
+                selector.setdefault(name, []).append((c, None if resnames == valid_res else resnames))
+
+    chain_order = {}
+    channel_residues = [{} for _ in (channels or [c3_atom])]
+
+    for k, (atom_name, chain_id, residue_id, resname, altloc, occupancy, x, y, z) in enumerate(records):
+        chain = chain_order.setdefault(chain_id, len(chain_order))
+        if residue_id is None:
+            continue
+        key = (chain, residue_id)
+        for c, resnames in selector[atom_name]:
+            if resnames is not None and resname not in resnames:
+                continue
+            residues = channel_residues[c]
+            kept = residues.get(key)
+            if kept is None:
+                residues[key] = [len(residues), resname, occupancy, x, y, z, k]
+            elif altloc and occupancy is not None and (kept[2] is None or occupancy > kept[2]):
+                kept[1:] = [resname, occupancy, x, y, z, k]
+
+    chain_ids = list(chain_order) if labels else None
+    arrays = [_encode_kept(residues, atom_indices, chain_ids) for residues in channel_residues]
+    return arrays[0] if channels is None else arrays
+
+def _encode_kept(residues, atom_indices=False, chain_ids=None):
+    """
+    Encode the `(chain, residue_id) -> entry` atoms kept by `_collect` as arrays, followed by
+    their labels when the chain identifiers (`chain_ids`, indexed by chain) are given.
+    """
+
+    ordered = sorted(residues.items(), key=lambda item: (item[0][0], item[1][0]))
+    keys = [key for key, entry in ordered if entry[1] in valid_res]
+    ordered = [(chain, entry) for (chain, _), entry in ordered if entry[1] in valid_res]
+
+    # Renumber chains by first appearance among the kept atoms, as `model.encode_atoms` does
+    chain_codes = {}
+    chains = np.fromiter((chain_codes.setdefault(chain, len(chain_codes)) for chain, _ in ordered),
+                         dtype=np.intp, count=len(ordered))
+    residue_codes = model.encode_residues(entry[1] for _, entry in ordered)
+    # Biopython stores coordinates in single precision
+    coords = np.array([entry[3:6] for _, entry in ordered], dtype=np.float32).astype(float).reshape(-1, 3)
+
+    arrays = (chains, residue_codes, coords)
+    if atom_indices:
+        arrays += (np.fromiter((entry[6] for _, entry in ordered), dtype=np.intp, count=len(ordered)),)
+    if chain_ids is not None:
+        # residue_id is (hetero flag, residue number, insertion code) in both parsers
+        arrays += (np.array([(chain_ids[chain], str(number), icode.strip())
+                             for chain, (_, number, icode) in keys], dtype=str).reshape(-1, 3),)
+    return arrays
+
+def _pdb_records(lines, all_models=False, atom_names=(c3_atom,)):
+    """
+    Stream the records of atoms named in `atom_names` (C3' by default) of the first model
+    from PDB-format lines; with `all_models`, stream every model, yielding None between two models.
+    """
+
+    atom_names = frozenset(atom_names)
+    atoms_seen = False
+    for line in lines:
+        record_type = line[0:6]
+        if record_type == "ATOM  " or record_type == "HETATM":
+            atoms_seen = True
+            chain_id = line[21]
+            atom_name = line[12:16].strip()
+            if atom_name not in atom_names:
+                # Still register the chain so that chains keep their file order
+                yield None, chain_id, None, None, None, None, None, None, None
+                continue
+
+            resname = line[17:20].strip()
+            if record_type == "HETATM":
+                hetero_flag = "W" if resname in ("HOH", "WAT") else "H"
+            else:
+                hetero_flag = " "
+            residue_id = (hetero_flag, int(line[22:26].split()[0]), line[26])
+
+            try:
+                occupancy = float(line[54:60])
+            except ValueError:
+                occupancy = None
+
+            altloc = line[16].strip()
+            yield (atom_name, chain_id, residue_id, resname, altloc, occupancy,
+                   float(line[30:38]), float(line[38:46]), float(line[46:54]))
+
+        elif record_type == "ENDMDL" or (record_type == "MODEL " and atoms_seen):
+            if not all_models:
+                return
+            if atoms_seen:
+                yield None
+            atoms_seen = False
+        elif record_type.rstrip() == "END" or record_type == "CONECT":
+            return
+
+_cif_token = re.compile(r"""'(?:[^']|'(?=\S))*'|"(?:[^"]|"(?=\S))*"|\S+""")
+
+def _cif_value(token):
+    """Strip mmCIF quoting; map the '.' and '?' placeholders to an empty string."""
+
+    if len(token) >= 2 and token[0] == token[-1] and token[0] in "'\"":
+        return token[1:-1]
+    return "" if token in (".", "?") else token
+
+def _mmcif_records(lines, all_models=False, atom_names=(c3_atom,)):
+    """
+    Stream the records of atoms named in `atom_names` (C3' by default) of the first model from
+    the `_atom_site` loop of mmCIF lines; with `all_models`, stream every model, yielding None
+    between two models.
+    """
+
+    atom_names = frozenset(atom_names)
+    lines = iter(lines)
+    fields = []
+
+    # Loop header: one `_atom_site.<field>` line per column
+    for line in lines:
+        if line.startswith("_atom_site."):
+            fields.append(line.split()[0][len("_atom_site."):])
+        elif fields:
+            break
+    else:
+        return
+
+    col = {name: k for k, name in enumerate(fields)}
+    required = ("group_PDB", "label_atom_id", "label_comp_id", "Cartn_x", "Cartn_y", "Cartn_z")
+    missing = [name for name in required if name not in col]
+    if missing:
+        raise ValueError(f"mmCIF _atom_site loop lacks fields {missing}")
+
+    c_group = col["group_PDB"]
+    c_atom = col["label_atom_id"]
+    c_resname = col["label_comp_id"]
+    c_chain = col.get("auth_asym_id", col.get("label_asym_id"))
+    c_seq = col.get("auth_seq_id", col.get("label_seq_id"))
+    c_icode = col.get("pdbx_PDB_ins_code")
+    c_alt = col.get("label_alt_id")
+    c_occupancy = col.get("occupancy")
+    c_model = col.get("pdbx_PDB_model_num")
+    c_x, c_y, c_z = col["Cartn_x"], col["Cartn_y"], col["Cartn_z"]
+
+    first_model = None
+    tokens = []
+    # `line` holds the first data row of the loop
+    while True:
+        if line.startswith(("_", "loop_", "data_", "#")):
+            return
+        tokens.extend(_cif_token.findall(line))
+
+        while len(tokens) >= len(fields):
+            row, tokens = tokens[:len(fields)], tokens[len(fields):]
+
+            if c_model is not None:
+                if first_model is None:
+                    first_model = row[c_model]
+                elif row[c_model] != first_model:
+                    if not all_models:
+                        return
+                    first_model = row[c_model]
+                    yield None
+
+            chain_id = _cif_value(row[c_chain]) if c_chain is not None else ""
+            atom_name = _cif_value(row[c_atom])
+            if atom_name not in atom_names:
+                yield None, chain_id, None, None, None, None, None, None, None
+                continue
+
+            resname = _cif_value(row[c_resname])
+            if row[c_group] == "HETATM":
+                hetero_flag = "W" if resname in ("HOH", "WAT") else "H"
+            else:
+                hetero_flag = " "
+            icode = _cif_value(row[c_icode]) if c_icode is not None else ""
+            residue_id = (hetero_flag, _cif_value(row[c_seq]) if c_seq is not None else "", icode or " ")
+
+            occupancy = None
+            if c_occupancy is not None and _cif_value(row[c_occupancy]):
+                occupancy = float(row[c_occupancy])
+            altloc = _cif_value(row[c_alt]) if c_alt is not None else ""
+
+            yield (atom_name, chain_id, residue_id, resname, altloc, occupancy,
+                   float(row[c_x]), float(row[c_y]), float(row[c_z]))
+
+        line = next(lines, None)
+        if line is None:
+            return
+
+def read_c3_arrays(struct_path, handle=None):
+    """
+    Stream a PDB/CIF file line by line and extract the C3' atoms of standard RNA residues
+    (A, U, G, C) from the first model, without building a Biopython structure.
+
+    Parameters
+    ----------
+    struct_path : str
+        Path to a PDB or mmCIF file; only its extension is used when `handle` is given.
+    handle : file-like, optional
+        Text stream to parse instead of opening `struct_path`.
+
+    Returns
+    -------
+    tuple
+        `(chains, residues, coords)` arrays, identical to
+        `model.encode_atoms(extract_c3_atoms(struct_path))`.
+    """
+
+    records = _records(struct_path)
+
+    if handle is not None:
+        return _collect(records(handle))
+
+    with open(struct_path) as handle:
+        return _collect(records(handle))
+
+def read_c3_topology(struct_path):
+    """
+    Read the C3' atoms of the first model of a topology PDB/CIF file, together with their
+    positions among all atoms of the model, so that coordinate frames of every atom (e.g. a
+    trajectory) can be reduced to the C3' atoms with one gather.
+
+    Parameters
+    ----------
+    struct_path : str
+        Path to a PDB or mmCIF file.
+
+    Returns
+    -------
+    tuple
+        `(chains, residues, coords, atom_indices)` where the first three are those of
+        `read_c3_arrays` and `atom_indices` holds the 0-based index of every C3' atom among
+        the ATOM/HETATM records of the first model.
+    """
+
+    records = _records(struct_path)
+
+    with open(struct_path) as handle:
+        return _collect(records(handle), atom_indices=True)
+
+def extract_c3_arrays(struct_path, handle=None):
+    """
+    Extract the C3' atoms of a PDB/CIF file as integer-coded arrays using `parser_backend`.
+
+    Results are served from and added to `structure_cache` when it is enabled; the
+    "validate" backend and streams given as `handle` always parse.
+
+    Parameters
+    ----------
+    struct_path : str
+        Path to a PDB or mmCIF file; only its extension is used when `handle` is given.
+    handle : file-like, optional
+        Text stream to parse instead of opening `struct_path`, e.g. an archive member.
+
+    Returns
+    -------
+    tuple
+        `(chains, residues, coords)` arrays as produced by `model.encode_atoms`.
+    """
+
+    if handle is not None:
+        # Both parsers may need the content, so read it once
+        return _parse_c3_arrays(struct_path, handle.read())
+
+    use_cache = structure_cache.enabled and _backend() != "validate"
+    if use_cache:
+        arrays = structure_cache.load(struct_path)
+        if arrays is not None:
+            return arrays
+
+    arrays = _parse_c3_arrays(struct_path)
+
+    if use_cache:
+        structure_cache.store(struct_path, arrays)
+    return arrays
+
+def _parse_c3_arrays(struct_path, text=None):
+    """Parse a structure file (or its `text`) with `parser_backend`, bypassing the cache."""
+
+    def stream():
+        return None if text is None else io.StringIO(text)
+
+    return _dispatch(struct_path, lambda: read_c3_arrays(struct_path, stream()),
+                     lambda: model.encode_atoms(extract_c3_atoms(struct_path, stream())))
+
+def _channel_names(channels):
+    """All atom names read by a set of channels."""
+
+    return {name for channel in channels for name in channel_atoms(channel).values()}
+
+def read_channel_arrays(struct_path, channels, handle=None):
+    """
+    Stream a PDB/CIF file once and extract the atoms of several channels (e.g. C3', P, C4'
+    and the N1/N9 base atoms) of standard RNA residues from the first model.
+
+    Parameters
+    ----------
+    struct_path : str
+        Path to a PDB or mmCIF file; only its extension is used when `handle` is given.
+    channels : sequence of str
+        Atom channels, see `channel_atoms`.
+    handle : file-like, optional
+        Text stream to parse instead of opening `struct_path`.
+
+    Returns
+    -------
+    list of tuple
+        `(chains, residues, coords)` arrays of every channel, in the order of `channels`;
+        those of the C3' channel are identical to `read_c3_arrays`. A residue lacking the
+        atom of a channel is left out of that channel only.
+    """
+
+    records = _records(struct_path)
+    atom_names = _channel_names(channels)
+
+    if handle is not None:
+        return _collect(records(handle, atom_names=atom_names), channels=channels)
+
+    with open(struct_path) as handle:
+        return _collect(records(handle, atom_names=atom_names), channels=channels)
+
+def extract_channel_arrays(struct_path, channels, handle=None):
+    """
+    Extract the atoms of several channels of a PDB/CIF file in one parse using `parser_backend`.
+
+    Every channel is cached separately in `structure_cache` (the C3' channel shares the
+    entries of `extract_c3_arrays`); the file is parsed when any channel is missing.
+
+    Parameters
+    ----------
+    struct_path : str
+        Path to a PDB or mmCIF file; only its extension is used when `handle` is given.
+    channels : sequence of str
+        Atom channels, see `channel_atoms`.
+    handle : file-like, optional
+        Text stream to parse instead of opening `struct_path`, e.g. an archive member.
+
+    Returns
+    -------
+    list of tuple
+        `(chains, residues, coords)` arrays of every channel, as returned by `read_channel_arrays`.
+    """
+
+    if handle is not None:
+        return _parse_channel_arrays(struct_path, channels, handle.read())
+
+    def variant(channel):
+        return "" if channel == c3_atom else channel
+
+    use_cache = structure_cache.enabled and _backend() != "validate"
+    if use_cache:
+        cached = [structure_cache.load(struct_path, variant(channel)) for channel in channels]
+        if all(arrays is not None for arrays in cached):
+            return cached
+
+    channel_arrays = _parse_channel_arrays(struct_path, channels)
+
+    if use_cache:
+        for channel, arrays in zip(channels, channel_arrays):
+            structure_cache.store(struct_path, arrays, variant(channel))
+    return channel_arrays
+
+def _parse_channel_arrays(struct_path, channels, text=None):
+    """Parse the channels of a structure file (or its `text`) with `parser_backend`, bypassing the cache."""
+
+    def stream():
+        return None if text is None else io.StringIO(text)
+
+    def biopython():
+        structure = _biopython_parser(struct_path).get_structure(
+            "structure", struct_path if text is None else stream())
+        first = next(structure.get_models())
+        return [model.encode_atoms(_model_atoms(first, channel)) for channel in channels]
+
+    return _dispatch(struct_path, lambda: read_channel_arrays(struct_path, channels, stream()), biopython)
+
+def extract_c3_labels(struct_path, handle=None):
+    """
+    Extract the C3' atoms of a PDB/CIF file with the labels needed to map them back to the
+    file, using `parser_backend`; labels are not cached, so the file is always parsed.
+
+    Parameters
+    ----------
+    struct_path : str
+        Path to a PDB or mmCIF file; only its extension is used when `handle` is given.
+    handle : file-like, optional
+        Text stream to parse instead of opening `struct_path`.
+
+    Returns
+    -------
+    tuple
+        `(chains, residues, coords, labels)` where the first three are those of
+        `extract_c3_arrays` and `labels` is the `(num_atoms, 3)` string array of the chain
+        identifier, residue number and insertion code (empty if none) of every atom.
+    """
+
+    text = handle.read() if handle is not None else None
+
+    def stream():
+        return None if text is None else io.StringIO(text)
+
+    def fast():
+        records = _records(struct_path)
+        if text is not None:
+            return _collect(records(stream()), labels=True)
+        with open(struct_path) as f:
+            return _collect(records(f), labels=True)
+
+    def biopython():
+        structure = _biopython_parser(struct_path).get_structure(
+            "structure", struct_path if text is None else stream())
+        labels = []
+        atoms = _model_atoms(next(structure.get_models()), labels=labels)
+        return (*model.encode_atoms(atoms), np.array(labels, dtype=str).reshape(-1, 3))
+
+    return _dispatch(struct_path, fast, biopython)
+
+def _split_models(records):
+    """Group a record stream with None model separators into one `_collect` result per model."""
+
+    records = iter(records)
+    end = object()
+    while True:
+        first = next(records, end)
+        if first is end:
+            return
+        if first is None:
+            continue
+        # Consume the records up to the next separator (or the end of the stream)
+        yield _collect(chain_iter([first], iter(lambda: next(records, None), None)))
+
+def _stack_models(struct_path, models):
+    """Stack per-model `(chains, residues, coords)` arrays sharing one topology."""
+
+    models = iter(models)
+    first = next(models, None)
+    if first is None:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty((0, 0, 3))
+
+    chains, residues, coords = first
+    frames = [coords]
+    for k, (c, r, xyz) in enumerate(models, start=2):
+        if not (np.array_equal(c, chains) and np.array_equal(r, residues)):
+            raise ValueError(f"Model {k} of {struct_path} does not share the C3' atoms of model 1")
+        frames.append(xyz)
+
+    return chains, residues, np.stack(frames)
+
+def read_c3_models(struct_path, handle=None):
+    """
+    Stream every model of a multi-model PDB/CIF file (NMR ensemble, exported trajectory) and
+    extract the C3' atoms of standard RNA residues, without building a Biopython structure.
+
+    Parameters
+    ----------
+    struct_path : str
+        Path to a PDB or mmCIF file; only its extension is used when `handle` is given.
+    handle : file-like, optional
+        Text stream to parse instead of opening `struct_path`.
+
+    Returns
+    -------
+    tuple
+        `(chains, residues, frames)` where `chains` and `residues` are shared by all models and
+        `frames` has shape `(num_models, num_atoms, 3)`.
+
+    Raises
+    ------
+    ValueError
+        If the models do not all have the same C3' atoms.
+    """
+
+    return _stack_models(struct_path, _read_models(struct_path, handle))
+
+def _read_models(struct_path, handle=None):
+    """Stream the C3' atoms of every model of a structure file as a list of `_collect` results."""
+
+    records = _records(struct_path)
+
+    if handle is not None:
+        return list(_split_models(records(handle, all_models=True)))
+
+    with open(struct_path) as handle:
+        return list(_split_models(records(handle, all_models=True)))
+
+def extract_c3_models(struct_path):
+    """
+    Extract the C3' atoms of every model of a PDB/CIF file using `parser_backend`.
+
+    The "fast" backend falls back to Biopython on malformed input and "validate" compares
+    both parsers, as in `extract_c3_arrays`; ensembles are not cached.
+
+    Parameters
+    ----------
+    struct_path : str
+        Path to a PDB or mmCIF file.
+
+    Returns
+    -------
+    tuple
+        `(chains, residues, frames)` as returned by `read_c3_models`.
+
+    Raises
+    ------
+    ValueError
+        If the models do not all have the same C3' atoms, whichever parser read them.
+    """
+
+    def biopython():
+        structure = _biopython_parser(struct_path).get_structure("structure", struct_path)
+        return [model.encode_atoms(_model_atoms(m)) for m in structure.get_models()]
+
+    # Only the parse may fall back; models without the same atoms are an error of the file
+    return _stack_models(struct_path, _dispatch(struct_path, lambda: _read_models(struct_path), biopython))
@@ -0,0 +1,213 @@
+import os
+import hashlib
+import tempfile
+import numpy as np
+
+# Parameters
+enabled = True
+cache_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "cache")
+max_size = 1 << 30                   # bytes; least recently used entries are evicted beyond this
+format_version = 1
+
+parameter_names = ("enabled", "cache_dir", "max_size")
+
+# Eviction empties the cache down to this fraction of `max_size`, so that the directory is only
+# rescanned after a sizeable amount of new entries
+evict_fraction = 0.9
+
+# `(cache_dir, bytes)` estimate of the cache size seen by this process: the total of the last
+# scan plus the entries written since. Entries written by other processes are only seen at the
+# next scan, so concurrent workers may briefly exceed `max_size` by what they wrote meanwhile.
+_size_estimate = None
+
+def parameters():
+    """
+    Snapshot the current cache settings.
+
+    Returns
+    -------
+    dict
+        Mapping of every name in `parameter_names` to its current value.
+    """
+
+    return {name: globals()[name] for name in parameter_names}
+
+def configure(**params):
+    """
+    Set cache settings, e.g. from a `parameters()` snapshot taken in another process.
+
+    Parameters
+    ----------
+    **params
+        New values for names in `parameter_names`.
+
+    Returns
+    -------
+    None
+    """
+
+    unknown = set(params) - set(parameter_names)
+    if unknown:
+        raise ValueError(f"Unknown cache parameters: {sorted(unknown)}")
+    globals().update(params)
+
+def cache_key(struct_path, variant=""):
+    """
+    Build the cache key of a structure file from its absolute path, size and modification time.
+
+    Parameters
+    ----------
+    struct_path : str
+        Path to a PDB/CIF file.
+    variant : str
+        Name of what was extracted from the file when it is not its C3' atoms, e.g. another
+        atom channel.
+
+    Returns
+    -------
+    str
+        Hex digest identifying this version of the file.
+    """
+
+    stat = os.stat(struct_path)
+    ident = f"{format_version}\0{os.path.abspath(struct_path)}\0{stat.st_size}\0{stat.st_mtime_ns}"
+    if variant:
+        ident += f"\0{variant}"
+    return hashlib.sha1(ident.encode()).hexdigest()
+
+def _entry_path(struct_path, variant=""):
+    return os.path.join(cache_dir, f"{cache_key(struct_path, variant)}.npz")
+
+def load(struct_path, variant=""):
+    """
+    Return the cached `(chains, residues, coords)` arrays of a structure file.
+
+    Parameters
+    ----------
+    struct_path : str
+        Path to a PDB/CIF file.
+    variant : str
+        See `cache_key`.
+
+    Returns
+    -------
+    tuple or None
+        The cached arrays, or None if the file is not cached (or was modified since).
+    """
+
+    entry = _entry_path(struct_path, variant)
+    try:
+        with np.load(entry) as data:
+            arrays = data["chains"], data["residues"], data["coords"]
+    except (OSError, KeyError, ValueError):
+        return None
+
+    # Mark as recently used
+    try:
+        os.utime(entry)
+    except OSError:
+        pass
+    return arrays
+
+def store(struct_path, arrays, variant=""):
+    """
+    Cache the `(chains, residues, coords)` arrays of a structure file and evict old entries.
+
+    Parameters
+    ----------
+    struct_path : str
+        Path to a PDB/CIF file.
+    arrays : tuple
+        `(chains, residues, coords)` arrays extracted from the file.
+    variant : str
+        See `cache_key`.
+
+    Returns
+    -------
+    None
+    """
+
+    os.makedirs(cache_dir, exist_ok=True)
+    chains, residues, coords = arrays
+
+    # Write to a temporary file first so that concurrent workers never read partial entries
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            np.savez_compressed(handle, chains=chains, residues=residues, coords=coords)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, _entry_path(struct_path, variant))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    # Only scan the cache folder when the running estimate goes over the cap
+    global _size_estimate
+    if _size_estimate is None or _size_estimate[0] != cache_dir:
+        evict()
+    else:
+        _size_estimate = (cache_dir, _size_estimate[1] + size)
+        if _size_estimate[1] > max_size:
+            evict()
+
+def evict():
+    """
+    Scan the cache and, if it is larger than `max_size` bytes, remove least recently used
+    entries until it fits in `evict_fraction * max_size` bytes.
+
+    Returns
+    -------
+    None
+    """
+
+    global _size_estimate
+    _size_estimate = None
+
+    try:
+        entries = [e for e in os.scandir(cache_dir) if e.name.endswith(".npz")]
+    except FileNotFoundError:
+        return
+
+    stats = []
+    for e in entries:
+        # Entries may be evicted by another worker while we scan
+        try:
+            stat = e.stat()
+        except FileNotFoundError:
+            continue
+        stats.append((stat.st_mtime_ns, stat.st_size, e.path))
+    total = sum(size for _, size, _ in stats)
+
+    if total > max_size:
+        target = evict_fraction * max_size
+        for _, size, path in sorted(stats):
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    _size_estimate = (cache_dir, total)
+
+def clear():
+    """
+    Remove every entry from the cache.
+
+    Returns
+    -------
+    None
+    """
+
+    global _size_estimate
+    _size_estimate = None
+
+    if not os.path.isdir(cache_dir):
+        return
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith((".npz", ".tmp")):
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,132 @@
+import os
+import numpy as np
+
+# Coordinate files read by `iter_frames`
+trajectory_extensions = (".npy", ".dcd")
+
+def _fortran_record(raw, offset, endian):
+    """Return `(payload, next_offset)` of the Fortran unformatted record starting at `offset`."""
+
+    size = int(np.frombuffer(raw, dtype=f"{endian}i4", count=1, offset=offset)[0])
+    end = offset + 4 + size
+    if int(np.frombuffer(raw, dtype=f"{endian}i4", count=1, offset=end)[0]) != size:
+        raise ValueError("Corrupted DCD record markers")
+    return raw[offset + 4:end], end + 4
+
+def _dcd_frames(path):
+    """
+    Memory-map the frames of a CHARMM/NAMD DCD file.
+
+    Returns
+    -------
+    tuple
+        `(frames, has_cell)` where `frames` is a structured memmap with one record per frame
+        and fields `x`, `y`, `z` of shape `(num_atoms,)`.
+    """
+
+    with open(path, "rb") as handle:
+        head = handle.read(1 << 16)
+
+    # The first record is 84 bytes long: its marker gives the byte order
+    if np.frombuffer(head, dtype="<i4", count=1)[0] == 84:
+        endian = "<"
+    elif np.frombuffer(head, dtype=">i4", count=1)[0] == 84:
+        endian = ">"
+    else:
+        raise ValueError(f"{path} is not a DCD file")
+
+    control, offset = _fortran_record(head, 0, endian)
+    if control[:4] != b"CORD":
+        raise ValueError(f"{path} is not a DCD coordinate file")
+    icntrl = np.frombuffer(control, dtype=f"{endian}i4", count=20, offset=4)
+    charmm = icntrl[19] != 0
+    if icntrl[8] != 0:
+        raise ValueError(f"{path} has fixed atoms, which are not supported")
+    if charmm and icntrl[11] != 0:
+        raise ValueError(f"{path} has a fourth dimension, which is not supported")
+    has_cell = bool(charmm and icntrl[10] != 0)
+
+    _, offset = _fortran_record(head, offset, endian)  # titles
+    natoms_record, offset = _fortran_record(head, offset, endian)
+    num_atoms = int(np.frombuffer(natoms_record, dtype=f"{endian}i4", count=1)[0])
+
+    fields = [("cell", "V56")] if has_cell else []
+    for axis in "xyz":
+        fields += [(f"{axis}_head", f"{endian}i4"), (axis, f"{endian}f4", num_atoms),
+                   (f"{axis}_tail", f"{endian}i4")]
+    frame = np.dtype(fields)
+
+    num_frames = (os.path.getsize(path) - offset) // frame.itemsize
+    if num_frames == 0:
+        return np.empty(0, dtype=frame), has_cell
+    return np.memmap(path, dtype=frame, mode="r", offset=offset, shape=(num_frames,)), has_cell
+
+def open_frames(path):
+    """
+    Open a coordinate trajectory without reading it.
+
+    Parameters
+    ----------
+    path : str
+        `.npy` array of shape `(num_frames, num_atoms, 3)` or CHARMM/NAMD `.dcd` file,
+        coordinates in Angstrom.
+
+    Returns
+    -------
+    tuple
+        `(num_frames, num_atoms, read)` where `read(start, stop, atoms)` returns the
+        `(stop - start, len(atoms), 3)` float array of the selected atoms of these frames.
+    """
+
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == ".npy":
+        frames = np.load(path, mmap_mode="r")
+        if frames.ndim != 3 or frames.shape[2] != 3:
+            raise ValueError(f"{path} must hold a (frames, atoms, 3) array, got shape {frames.shape}")
+
+        def read(start, stop, atoms):
+            return np.asarray(frames[start:stop][:, atoms], dtype=float)
+
+        return frames.shape[0], frames.shape[1], read
+
+    if ext == ".dcd":
+        frames, _ = _dcd_frames(path)
+        num_atoms = frames.dtype["x"].shape[0]
+
+        def read(start, stop, atoms):
+            block = frames[start:stop]
+            return np.stack([block[axis][:, atoms] for axis in "xyz"], axis=2).astype(float)
+
+        return len(frames), num_atoms, read
+
+    raise ValueError(f"Unsupported trajectory format {ext!r}, expected one of {trajectory_extensions}")
+
+def iter_frames(path, atom_indices, chunk_frames=1000):
+    """
+    Read the coordinates of selected atoms from a trajectory in chunks of frames.
+
+    The file is memory-mapped, so only the current chunk is ever held in memory.
+
+    Parameters
+    ----------
+    path : str
+        Trajectory file, see `open_frames`.
+    atom_indices : np.ndarray
+        0-based indices of the atoms to keep, in the trajectory's atom order.
+    chunk_frames : int
+        Number of frames per chunk.
+
+    Yields
+    ------
+    tuple
+        `(start, coords)` with `coords` of shape `(frames_in_chunk, len(atom_indices), 3)`
+        and `start` the index of its first frame.
+    """
+
+    num_frames, num_atoms, read = open_frames(path)
+    if len(atom_indices) and atom_indices.max() >= num_atoms:
+        raise ValueError(f"{path} has {num_atoms} atoms per frame, fewer than the topology")
+
+    for start in range(0, num_frames, chunk_frames):
+        yield start, read(start, min(start + chunk_frames, num_frames), atom_indices)